@@ -6,7 +6,7 @@ from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Union
 
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
@@ -15,11 +15,11 @@ from pydantic import BaseModel, Field
 from sse_starlette.sse import EventSourceResponse
 
 from ..config import TEAM_MEMBERS
-from ..db import close_db_connect, connect_and_init_db
-from ..graph import build_graph
+from ..db import close_db_connect, connect_and_init_db, get_pool_stats
+from ..graph import close_graph, get_graph, init_graph
 from ..service.history_service import (
     get_grouped_all_history_by_user_id,
-    get_grouped_travel_planner_detail_history_by_chat_id,
+    get_thread_history,
 )
 from ..service.workflow_service import run_agent_workflow
 
@@ -31,7 +31,9 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     """FastAPI 생명주기 관리"""
     await connect_and_init_db()
+    await init_graph()
     yield
+    await close_graph()
     await close_db_connect()
 
 
@@ -92,6 +94,9 @@ class ChatHistoryResponse(BaseModel):
 
     total_cnt: int = Field(..., description="전체 개수")
     history: List[dict] = Field(..., description="히스토리 데이터")
+    next_cursor: Optional[str] = Field(
+        None, description="다음 페이지 커서 (마지막 페이지이면 null)"
+    )
 
 
 # 기존 스트리밍 엔드포인트 유지 (호환성을 위해)
@@ -137,23 +142,23 @@ async def chat_stream_endpoint(
         async def event_generator():
             """이벤트 생성기"""
             try:
-                async with build_graph() as graph:
-                    async for event in run_agent_workflow(
-                        graph,
-                        user_id,
-                        thread_id,
-                        messages,
-                        request.search_before_planning,
-                    ):
-                        # 클라이언트 연결 상태 확인
-                        if await req.is_disconnected():
-                            logger.info("Client disconnected, stopping workflow")
-                            break
-
-                        yield {
-                            "event": event["event"],
-                            "data": json.dumps(event["data"], ensure_ascii=False),
-                        }
+                graph = await get_graph()
+                async for event in run_agent_workflow(
+                    graph,
+                    user_id,
+                    thread_id,
+                    messages,
+                    request.search_before_planning,
+                ):
+                    # 클라이언트 연결 상태 확인
+                    if await req.is_disconnected():
+                        logger.info("Client disconnected, stopping workflow")
+                        break
+
+                    yield {
+                        "event": event["event"],
+                        "data": json.dumps(event["data"], ensure_ascii=False),
+                    }
             except asyncio.CancelledError:
                 logger.info("Stream processing cancelled")
                 raise
@@ -174,13 +179,25 @@ async def health_check():
     return {"status": "healthy", "service": "travel-planner-api"}
 
 
+@app.get("/health/db-pool")
+async def db_pool_health():
+    """MongoDB 커넥션 풀 사용 현황 (체크아웃된 연결 수, 대기 시간)"""
+    return get_pool_stats()
+
+
 @app.get("/api/chat/history", response_model=List[dict])
-async def get_chat_history(user_id: str, thread_id: str):
-    """채팅 히스토리 조회"""
+async def get_chat_history(
+    user_id: str, thread_id: str, req: Request, response: Response
+):
+    """채팅 히스토리 조회 (ETag를 If-None-Match로 보내면 변경이 없을 때 304)"""
     try:
-        history = await get_grouped_travel_planner_detail_history_by_chat_id(
-            user_id, thread_id
+        etag, history = await get_thread_history(
+            user_id, thread_id, req.headers.get("if-none-match")
         )
+        if history is None:
+            return Response(status_code=304, headers={"ETag": etag})
+        if etag:
+            response.headers["ETag"] = etag
         return history
     except Exception as e:
         logger.error(f"Error getting chat history: {e}")
@@ -188,13 +205,17 @@ async def get_chat_history(user_id: str, thread_id: str):
 
 
 @app.get("/api/chat/history/all", response_model=ChatHistoryResponse)
-async def get_all_chat_history(user_id: str, page: int = 1, page_size: int = 10):
-    """전체 채팅 히스토리 조회"""
+async def get_all_chat_history(
+    user_id: str, page: int = 1, page_size: int = 10, cursor: Optional[str] = None
+):
+    """전체 채팅 히스토리 조회 (cursor가 있으면 page 대신 커서 다음부터 조회)"""
     try:
-        total_cnt, history = await get_grouped_all_history_by_user_id(
-            user_id, page, page_size
+        total_cnt, history, next_cursor = await get_grouped_all_history_by_user_id(
+            user_id, page, page_size, cursor
         )
-        return {"total_cnt": total_cnt, "history": history}
+        return {"total_cnt": total_cnt, "history": history, "next_cursor": next_cursor}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting all chat history: {e}")
         raise HTTPException(status_code=500, detail=str(e))
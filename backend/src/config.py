@@ -9,4 +9,61 @@ load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 MONGO_URI = os.getenv("MONGO_URI")
 MONGO_DB_NAME = os.getenv("MONGO_DB_NAME")
+# 체크포인터와 히스토리 서비스가 공유하는 커넥션 풀 크기
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "300"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "15"))
 TEAM_MEMBERS = ["calendar", "search", "sharing", "travel_planner"]
+
+# 체크포인트 저장소: mongodb | sqlite(단일 노드, WAL 모드) | memory(프로세스 내, 재시작 시 삭제)
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "mongodb")
+CHECKPOINT_SQLITE_PATH = os.getenv("CHECKPOINT_SQLITE_PATH", "checkpoints.sqlite")
+
+# supervisor 라우팅 방식: "llm"(매 단계 LLM 호출) 또는 "plan"(planner 계획 순서대로 진행)
+ROUTING_MODE = os.getenv("ROUTING_MODE", "llm")
+# plan 라우팅에서 서로 의존하지 않는 단계를 동시에 실행할지 여부
+PARALLEL_PLAN_STEPS = os.getenv("PARALLEL_PLAN_STEPS", "false").lower() == "true"
+# coordinator 응답을 기다리지 않고 planner를 미리 시작할지 여부
+SPECULATIVE_PLANNING = os.getenv("SPECULATIVE_PLANNING", "false").lower() == "true"
+# 대화 기록이 이 토큰 수(근사치)를 넘으면 오래된 턴을 요약합니다. 0이면 비활성화
+COMPACTION_TOKEN_THRESHOLD = int(os.getenv("COMPACTION_TOKEN_THRESHOLD", "0"))
+# 압축 후에도 원문 그대로 남길 최근 메시지 수
+COMPACTION_KEEP_MESSAGES = int(os.getenv("COMPACTION_KEEP_MESSAGES", "8"))
+# 하위 에이전트 체크포인트: shared(외부 그래프와 같은 저장소) | ephemeral(저장하지 않음)
+SUBAGENT_CHECKPOINT_MODE = os.getenv("SUBAGENT_CHECKPOINT_MODE", "shared")
+# 시작 시 체크포인트 쿼리의 실행 계획(explain)을 점검해 컬렉션 스캔을 경고
+CHECKPOINT_QUERY_PLAN_CHECK = (
+    os.getenv("CHECKPOINT_QUERY_PLAN_CHECK", "true").lower() == "true"
+)
+# 스레드별로 남길 최근 루트 체크포인트 수(하위 에이전트 체크포인트는 함께 정리). 0이면 정리하지 않음
+CHECKPOINT_KEEP_LAST = int(os.getenv("CHECKPOINT_KEEP_LAST", "0"))
+# 마지막 활동 후 이 일수가 지난 스레드를 대화 기록까지 삭제. 0이면 비활성화
+CHECKPOINT_THREAD_TTL_DAYS = int(os.getenv("CHECKPOINT_THREAD_TTL_DAYS", "0"))
+# 체크포인트 정리 작업 실행 간격(초)
+CHECKPOINT_RETENTION_INTERVAL_SECONDS = int(
+    os.getenv("CHECKPOINT_RETENTION_INTERVAL_SECONDS", "3600")
+)
+# 체크포인트 저장 방식: full(매 단계 전체 상태) | delta(부모 대비 바뀐 채널만 저장)
+CHECKPOINT_STORAGE_MODE = os.getenv("CHECKPOINT_STORAGE_MODE", "full")
+# delta 모드에서 전체 스냅샷을 저장하는 간격(체크포인트 수). 복원 시 읽는 문서 수의 상한
+CHECKPOINT_SNAPSHOT_INTERVAL = int(os.getenv("CHECKPOINT_SNAPSHOT_INTERVAL", "10"))
+# 체크포인트/쓰기 blob 압축: none | zlib | zstd (기존 비압축 문서도 그대로 읽음)
+CHECKPOINT_COMPRESSION = os.getenv("CHECKPOINT_COMPRESSION", "none")
+CHECKPOINT_COMPRESSION_LEVEL = int(os.getenv("CHECKPOINT_COMPRESSION_LEVEL", "3"))
+# python -m src.db.compression 으로 학습한 zstd 사전 파일 경로 (선택)
+CHECKPOINT_COMPRESSION_DICT = os.getenv("CHECKPOINT_COMPRESSION_DICT", "")
+# 스레드별 최신 체크포인트를 메모리에 캐시할 스레드 수. 0이면 비활성화 (단일 프로세스 배포에서만 사용)
+CHECKPOINT_CACHE_SIZE = int(os.getenv("CHECKPOINT_CACHE_SIZE", "0"))
+# 중간 쓰기(aput_writes)를 모아 한 번에 저장하는 지연 시간(ms). 0이면 즉시 저장
+CHECKPOINT_WRITE_BEHIND_MS = int(os.getenv("CHECKPOINT_WRITE_BEHIND_MS", "0"))
+# 포맷된 대화 내역(/api/chat/history)을 메모리에 캐시할 스레드 수. 0이면 비활성화
+HISTORY_CACHE_SIZE = int(os.getenv("HISTORY_CACHE_SIZE", "256"))
+# 체크포인트 쓰기 내구성: default | fast(w=0) | acknowledged(w=1, j=false) | journaled | majority
+# 외부 그래프 체크포인트 / 하위 에이전트 체크포인트 / 중간 쓰기(aput_writes) 별로 지정
+CHECKPOINT_DURABILITY = os.getenv("CHECKPOINT_DURABILITY", "default")
+SUBGRAPH_CHECKPOINT_DURABILITY = os.getenv("SUBGRAPH_CHECKPOINT_DURABILITY", "default")
+CHECKPOINT_WRITES_DURABILITY = os.getenv("CHECKPOINT_WRITES_DURABILITY", "default")
+# 시작 시 체크포인트 인덱스를 생성할지 여부. false면 존재 여부만 확인하고 없으면 시작 실패
+# (python -m src.db.migrate 로 미리 생성)
+CHECKPOINT_CREATE_INDEXES = (
+    os.getenv("CHECKPOINT_CREATE_INDEXES", "true").lower() == "true"
+)
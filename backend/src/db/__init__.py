@@ -1,4 +1,27 @@
-from .base import close_db_connect, connect_and_init_db, get_db
+from .base import (
+    close_db_connect,
+    connect_and_init_db,
+    get_client,
+    get_db,
+    get_pool_stats,
+)
+from .compression import get_blob_codec, get_blob_serde
+from .history_cache import history_cache
+from .local_checkpoint import LocalCheckpointSaver
+from .message_display import extract_response_content, message_display
 from .mongodb_checkpoint import CustomAsyncMongoDBSaver
 
-__all__ = ["close_db_connect", "connect_and_init_db", "get_db", CustomAsyncMongoDBSaver]
+__all__ = [
+    "close_db_connect",
+    "connect_and_init_db",
+    "get_client",
+    "get_db",
+    "get_pool_stats",
+    "get_blob_codec",
+    "get_blob_serde",
+    "extract_response_content",
+    "message_display",
+    "history_cache",
+    "CustomAsyncMongoDBSaver",
+    "LocalCheckpointSaver",
+]
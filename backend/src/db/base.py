@@ -2,16 +2,28 @@ import logging
 
 from motor.motor_asyncio import AsyncIOMotorClient
 
-from ..config import MONGO_DB_NAME, MONGO_URI
+from ..config import (
+    MONGO_DB_NAME,
+    MONGO_MAX_POOL_SIZE,
+    MONGO_MIN_POOL_SIZE,
+    MONGO_URI,
+)
+from .pool_metrics import PoolMetrics
 
 client: AsyncIOMotorClient = None
+pool_metrics = PoolMetrics()
 
 
-async def get_db() -> AsyncIOMotorClient:
+async def get_client() -> AsyncIOMotorClient:
+    """체크포인터와 히스토리 서비스가 함께 쓰는 공유 클라이언트를 반환합니다."""
     if client is None:
         await connect_and_init_db()
+    return client
+
+
+async def get_db() -> AsyncIOMotorClient:
     db_name = MONGO_DB_NAME
-    return client[db_name]
+    return (await get_client())[db_name]
 
 
 async def connect_and_init_db():
@@ -19,14 +31,15 @@ async def connect_and_init_db():
     try:
         client = AsyncIOMotorClient(
             MONGO_URI,
-            maxPoolSize=300,
-            minPoolSize=15,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
             uuidRepresentation="standard",
             serverSelectionTimeoutMS=5000,  # 서버 선택 타임아웃
             connectTimeoutMS=10000,  # 연결 타임아웃
             socketTimeoutMS=45000,  # 소켓 타임아웃
             waitQueueTimeoutMS=30000,  # 대기열 타임아웃
             retryReads=True,  # 읽기 재시도
+            event_listeners=[pool_metrics],  # 커넥션 풀 지표 수집
         )
 
         logging.info("Connected to mongo.")
@@ -43,3 +56,12 @@ async def close_db_connect():
     client.close()
     client = None
     logging.info("Mongo connection closed.")
+
+
+def get_pool_stats() -> dict:
+    """공유 커넥션 풀의 설정과 사용 지표를 반환합니다."""
+    return {
+        "max_pool_size": MONGO_MAX_POOL_SIZE,
+        "min_pool_size": MONGO_MIN_POOL_SIZE,
+        **pool_metrics.snapshot(),
+    }
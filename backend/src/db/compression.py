@@ -0,0 +1,186 @@
+import argparse
+import asyncio
+import logging
+import zlib
+from functools import lru_cache
+from typing import Any, Optional
+
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from ..config import (
+    CHECKPOINT_COMPRESSION,
+    CHECKPOINT_COMPRESSION_DICT,
+    CHECKPOINT_COMPRESSION_LEVEL,
+    MONGO_DB_NAME,
+    MONGO_URI,
+)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_ALGORITHMS = ("none", "zlib", "zstd")
+# Blobs smaller than this are stored as is; the frame overhead is not worth it.
+MIN_COMPRESS_SIZE = 256
+DEFAULT_DICT_SIZE = 112640
+
+
+def _require_zstandard():
+    if zstandard is None:
+        raise ImportError(
+            "zstd compression requires the zstandard package: uv add zstandard"
+        )
+    return zstandard
+
+
+def load_dictionary(path: str) -> Optional[bytes]:
+    """Read a trained zstd dictionary. An empty path means no dictionary."""
+    if not path:
+        return None
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class BlobCodec:
+    """Compress serialized checkpoint blobs and tag the algorithm in their type.
+
+    A compressed blob is stored with type "<algorithm>+<serde type>", for example
+    "zstd+msgpack". Untagged blobs are returned unchanged, so documents written
+    before compression was enabled still load. A zstd dictionary must be kept
+    as long as documents compressed with it exist.
+    """
+
+    def __init__(
+        self,
+        algorithm: str = "none",
+        level: int = 3,
+        dictionary: Optional[bytes] = None,
+    ) -> None:
+        if algorithm not in COMPRESSION_ALGORITHMS:
+            raise ValueError(
+                f"Unknown compression '{algorithm}', expected one of {COMPRESSION_ALGORITHMS}"
+            )
+        self.algorithm = algorithm
+        self.level = level
+        self._compressor = None
+        self._decompressor = None
+        if algorithm == "zstd" or dictionary is not None:
+            zstd = _require_zstandard()
+            dict_data = (
+                zstd.ZstdCompressionDict(dictionary) if dictionary is not None else None
+            )
+            self._compressor = zstd.ZstdCompressor(level=level, dict_data=dict_data)
+            self._decompressor = zstd.ZstdDecompressor(dict_data=dict_data)
+
+    def encode(self, type_: str, data: bytes) -> tuple[str, bytes]:
+        if self.algorithm == "none" or len(data) < MIN_COMPRESS_SIZE:
+            return type_, data
+        if self.algorithm == "zstd":
+            return f"zstd+{type_}", self._compressor.compress(data)
+        return f"zlib+{type_}", zlib.compress(data, self.level)
+
+    def decode(self, type_: str, data: bytes) -> tuple[str, bytes]:
+        algorithm, _, inner_type = type_.partition("+")
+        if not inner_type:
+            return type_, data
+        if algorithm == "zlib":
+            return inner_type, zlib.decompress(data)
+        if algorithm == "zstd":
+            if self._decompressor is None:
+                self._decompressor = _require_zstandard().ZstdDecompressor()
+            return inner_type, self._decompressor.decompress(data)
+        raise ValueError(f"Unknown compressed blob type: {type_}")
+
+
+class CompressingSerializer(SerializerProtocol):
+    """Serializer wrapper that runs every typed blob through a BlobCodec."""
+
+    def __init__(self, serde: SerializerProtocol, codec: BlobCodec) -> None:
+        self.serde = serde
+        self.codec = codec
+
+    def dumps(self, obj: Any) -> bytes:
+        return self.serde.dumps(obj)
+
+    def loads(self, data: bytes) -> Any:
+        return self.serde.loads(data)
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        return self.codec.encode(*self.serde.dumps_typed(obj))
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        return self.serde.loads_typed(self.codec.decode(*data))
+
+
+@lru_cache
+def get_blob_codec() -> BlobCodec:
+    """Codec configured by the CHECKPOINT_COMPRESSION* settings."""
+    return BlobCodec(
+        CHECKPOINT_COMPRESSION,
+        CHECKPOINT_COMPRESSION_LEVEL,
+        load_dictionary(CHECKPOINT_COMPRESSION_DICT),
+    )
+
+
+@lru_cache
+def get_blob_serde() -> CompressingSerializer:
+    """Serializer that reads and writes checkpoint and write blobs with get_blob_codec()."""
+    return CompressingSerializer(JsonPlusSerializer(), get_blob_codec())
+
+
+def train_dictionary(samples: list[bytes], dict_size: int = DEFAULT_DICT_SIZE) -> bytes:
+    """Train a zstd dictionary on uncompressed checkpoint and write blobs."""
+    zstd = _require_zstandard()
+    return zstd.train_dictionary(dict_size, samples).as_bytes()
+
+
+async def sample_blobs(
+    db: Any, collections: dict[str, str], limit: int, codec: BlobCodec
+) -> list[bytes]:
+    """Read up to `limit` uncompressed blobs from each {collection: blob field}."""
+    samples = []
+    for collection, field in collections.items():
+        cursor = db[collection].aggregate(
+            [{"$sample": {"size": limit}}, {"$project": {"type": 1, field: 1}}]
+        )
+        async for doc in cursor:
+            if doc.get("type") and doc.get(field):
+                samples.append(codec.decode(doc["type"], doc[field])[1])
+    return samples
+
+
+async def _train_from_db(output: str, limit: int, dict_size: int) -> None:
+    client = AsyncIOMotorClient(MONGO_URI)
+    try:
+        samples = await sample_blobs(
+            client[MONGO_DB_NAME],
+            {
+                "travel_planner_checkpoint": "checkpoint",
+                "travel_planner_history": "value",
+            },
+            limit,
+            get_blob_codec(),
+        )
+    finally:
+        client.close()
+    dictionary = train_dictionary(samples, dict_size)
+    with open(output, "wb") as f:
+        f.write(dictionary)
+    logger.info(f"Trained a {len(dictionary)} byte dictionary on {len(samples)} blobs")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Train a zstd dictionary on stored checkpoint blobs."
+    )
+    parser.add_argument("output", help="Path of the dictionary file to write")
+    parser.add_argument("--samples", type=int, default=1000)
+    parser.add_argument("--dict-size", type=int, default=DEFAULT_DICT_SIZE)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_train_from_db(args.output, args.samples, args.dict_size))
@@ -0,0 +1,57 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..config import HISTORY_CACHE_SIZE
+
+
+class HistoryCache:
+    """(user_id, thread_id)별 포맷된 대화 내역을 보관하는 LRU 캐시입니다.
+
+    항목은 스레드의 마지막 쓰기 시각(version)과 함께 저장되며 version이 다르면
+    무시됩니다. 체크포인터가 쓰기/삭제 시 invalidate를 호출하므로 같은 시각에
+    들어온 쓰기도 반영됩니다. 로컬 체크포인터는 작업 스레드에서 호출하므로
+    잠금으로 보호합니다.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Tuple[str, str], Tuple[str, List[Dict[str, Any]]]]
+        self._entries = OrderedDict()
+
+    def get(
+        self, user_id: str, thread_id: str, version: str
+    ) -> Optional[List[Dict[str, Any]]]:
+        """version이 같은 캐시 항목을 반환합니다. 없으면 None을 반환합니다."""
+        with self._lock:
+            entry = self._entries.get((user_id, thread_id))
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end((user_id, thread_id))
+            return entry[1]
+
+    def put(
+        self,
+        user_id: str,
+        thread_id: str,
+        version: str,
+        history: List[Dict[str, Any]],
+    ) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[(user_id, thread_id)] = (version, history)
+            self._entries.move_to_end((user_id, thread_id))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, thread_id: str, user_id: Optional[str] = None) -> None:
+        """스레드의 캐시 항목을 지웁니다. user_id가 없으면 모든 사용자의 항목을 지웁니다."""
+        with self._lock:
+            for key in [key for key in self._entries if key[1] == thread_id]:
+                if user_id is None or key[0] == user_id:
+                    del self._entries[key]
+
+
+history_cache = HistoryCache(HISTORY_CACHE_SIZE)
@@ -0,0 +1,403 @@
+import asyncio
+import builtins
+import json
+import sqlite3
+import threading
+from collections.abc import AsyncIterator, Callable, Iterator, Sequence
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
+
+from .message_display import message_display
+from .mongodb_checkpoint import HISTORY_CHANNEL
+
+IN_MEMORY = ":memory:"
+
+# Same keys as the Mongo collections: every row is scoped by user_id, and the
+# writes table is what the chat history is read from.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    timestamp TEXT NOT NULL,
+    PRIMARY KEY (thread_id, user_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    task_path TEXT NOT NULL DEFAULT '',
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    timestamp TEXT NOT NULL,
+    display TEXT,
+    PRIMARY KEY (thread_id, user_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE INDEX IF NOT EXISTS writes_user_channel_timestamp
+    ON writes (user_id, channel, timestamp);
+CREATE INDEX IF NOT EXISTS writes_thread_user_timestamp
+    ON writes (thread_id, user_id, timestamp);
+"""
+
+
+class LocalCheckpointSaver(BaseCheckpointSaver):
+    """SQLite checkpointer with the same user_id scoping as CustomAsyncMongoDBSaver.
+
+    Pass a file path for a WAL-mode database or ":memory:" for an in-process
+    store that is lost on restart. All queries run on one connection in a worker
+    thread, so it suits single-node deployments and benchmarks. Besides the
+    checkpointer API it answers the chat history queries of history_service.
+    """
+
+    def __init__(
+        self,
+        path: str = IN_MEMORY,
+        on_history_change: Optional[Callable[[str, Optional[str]], None]] = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(**kwargs)
+        self.path = path
+        self.on_history_change = on_history_change
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        if path != IN_MEMORY:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        columns = {
+            row["name"] for row in self.conn.execute("PRAGMA table_info(writes)")
+        }
+        if "display" not in columns:
+            # Databases created before the display column was added.
+            self.conn.execute("ALTER TABLE writes ADD COLUMN display TEXT")
+        self.lock = threading.Lock()
+
+    @classmethod
+    @asynccontextmanager
+    async def from_path(
+        cls, path: str = IN_MEMORY, **kwargs: Any
+    ) -> AsyncIterator["LocalCheckpointSaver"]:
+        """Create a local checkpointer and close its connection on exit."""
+        saver = await asyncio.to_thread(cls, path, **kwargs)
+        try:
+            yield saver
+        finally:
+            saver.conn.close()
+
+    def _query(self, sql: str, params: Sequence[Any] = ()) -> list[sqlite3.Row]:
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def _row_to_tuple(self, row: sqlite3.Row) -> CheckpointTuple:
+        config_values = {
+            "thread_id": row["thread_id"],
+            "user_id": row["user_id"],
+            "checkpoint_ns": row["checkpoint_ns"],
+            "checkpoint_id": row["checkpoint_id"],
+        }
+        writes = self._query(
+            "SELECT task_id, channel, type, value FROM writes WHERE thread_id = ? "
+            "AND user_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? "
+            "ORDER BY task_id, idx",
+            tuple(config_values.values()),
+        )
+        return CheckpointTuple(
+            config={"configurable": config_values},
+            checkpoint=self.serde.loads_typed((row["type"], row["checkpoint"])),
+            metadata=self.serde.loads_typed((row["metadata_type"], row["metadata"])),
+            parent_config=(
+                {
+                    "configurable": {
+                        **config_values,
+                        "checkpoint_id": row["parent_checkpoint_id"],
+                    }
+                }
+                if row["parent_checkpoint_id"]
+                else None
+            ),
+            pending_writes=[
+                (
+                    wrt["task_id"],
+                    wrt["channel"],
+                    self.serde.loads_typed((wrt["type"], wrt["value"])),
+                )
+                for wrt in writes
+            ],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        configurable = config["configurable"]
+        sql = (
+            "SELECT * FROM checkpoints WHERE thread_id = ? AND user_id = ? "
+            "AND checkpoint_ns = ?"
+        )
+        params = [
+            configurable["thread_id"],
+            configurable["user_id"],
+            configurable.get("checkpoint_ns", ""),
+        ]
+        if checkpoint_id := get_checkpoint_id(config):
+            sql += " AND checkpoint_id = ?"
+            params.append(checkpoint_id)
+        rows = self._query(sql + " ORDER BY checkpoint_id DESC LIMIT 1", params)
+        return self._row_to_tuple(rows[0]) if rows else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        clauses, params = [], []
+        if config is not None:
+            for key in ("thread_id", "user_id", "checkpoint_ns"):
+                if key in config["configurable"]:
+                    clauses.append(f"{key} = ?")
+                    params.append(config["configurable"][key])
+        if before is not None:
+            clauses.append("checkpoint_id < ?")
+            params.append(before["configurable"]["checkpoint_id"])
+        sql = "SELECT * FROM checkpoints"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        rows = self._query(sql + " ORDER BY checkpoint_id DESC", params)
+        count = 0
+        for row in rows:
+            checkpoint_tuple = self._row_to_tuple(row)
+            if filter and any(
+                checkpoint_tuple.metadata.get(key) != value
+                for key, value in filter.items()
+            ):
+                continue
+            yield checkpoint_tuple
+            count += 1
+            if limit is not None and count >= limit:
+                return
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        configurable = config["configurable"]
+        type_, serialized_checkpoint = self.serde.dumps_typed(checkpoint)
+        metadata_type, serialized_metadata = self.serde.dumps_typed(metadata)
+        timestamp = datetime.now(tz=timezone.utc)
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    configurable["thread_id"],
+                    configurable["user_id"],
+                    configurable["checkpoint_ns"],
+                    checkpoint["id"],
+                    configurable.get("checkpoint_id"),
+                    type_,
+                    serialized_checkpoint,
+                    metadata_type,
+                    serialized_metadata,
+                    timestamp.isoformat(),
+                ),
+            )
+        return {
+            "configurable": {
+                "thread_id": configurable["thread_id"],
+                "user_id": configurable["user_id"],
+                "timestamp": timestamp,
+                "checkpoint_ns": configurable["checkpoint_ns"],
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        configurable = config["configurable"]
+        # Allow replacement on existing writes only if there were errors.
+        verb = (
+            "INSERT OR REPLACE"
+            if all(w[0] in WRITES_IDX_MAP for w in writes)
+            else "INSERT OR IGNORE"
+        )
+        timestamp = datetime.now(tz=timezone.utc).isoformat()
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, serialized_value = self.serde.dumps_typed(value)
+            rows.append(
+                (
+                    configurable["thread_id"],
+                    configurable["user_id"],
+                    configurable["checkpoint_ns"],
+                    configurable["checkpoint_id"],
+                    task_id,
+                    WRITES_IDX_MAP.get(channel, idx),
+                    task_path,
+                    channel,
+                    type_,
+                    serialized_value,
+                    timestamp,
+                    json.dumps(message_display(value)),
+                )
+            )
+        with self.lock, self.conn:
+            self.conn.executemany(
+                f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+        if self.on_history_change is not None:
+            self.on_history_change(configurable["thread_id"], configurable["user_id"])
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self.lock, self.conn:
+            self.conn.execute(
+                "DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,)
+            )
+            self.conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+        if self.on_history_change is not None:
+            self.on_history_change(thread_id, None)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        checkpoint_tuples = await asyncio.to_thread(
+            lambda: [*self.list(config, filter=filter, before=before, limit=limit)]
+        )
+        for checkpoint_tuple in checkpoint_tuples:
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(
+            self.put, config, checkpoint, metadata, new_versions
+        )
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    # Chat history queries used by history_service; rows are returned as dicts
+    # with the same keys as the Mongo writes documents.
+    def _history_docs(
+        self, rows: builtins.list[sqlite3.Row]
+    ) -> builtins.list[dict[str, Any]]:
+        docs = []
+        for row in rows:
+            doc = {**dict(row), "timestamp": datetime.fromisoformat(row["timestamp"])}
+            # Rows written before the display column was added have no display.
+            if row["display"] is None:
+                del doc["display"]
+            else:
+                doc["display"] = json.loads(row["display"])
+            docs.append(doc)
+        return docs
+
+    async def ahistory_threads(
+        self,
+        user_id: str,
+        page: int,
+        page_size: int,
+        after: Optional[tuple[str, str]] = None,
+    ) -> tuple[int, builtins.list[dict[str, Any]]]:
+        """Return the first history write of each thread, newest thread first.
+
+        `after` is a (timestamp, thread_id) keyset cursor; when given, threads
+        after it are returned and `page` is ignored.
+        """
+        query = (
+            "SELECT * FROM (SELECT *, ROW_NUMBER() OVER (PARTITION BY thread_id "
+            "ORDER BY timestamp, rowid) AS position FROM writes "
+            "WHERE user_id = ? AND channel = ?) WHERE position = 1"
+        )
+        params: tuple = (user_id, HISTORY_CHANNEL)
+        offset = (page - 1) * page_size
+        if after is not None:
+            query += " AND (timestamp < ? OR (timestamp = ? AND thread_id < ?))"
+            params += (after[0], after[0], after[1])
+            offset = 0
+        rows = await asyncio.to_thread(
+            self._query,
+            query + " ORDER BY timestamp DESC, thread_id DESC LIMIT ? OFFSET ?",
+            params + (page_size, offset),
+        )
+        total = await asyncio.to_thread(
+            self._query,
+            "SELECT COUNT(DISTINCT thread_id) AS total FROM writes "
+            "WHERE user_id = ? AND channel = ?",
+            (user_id, HISTORY_CHANNEL),
+        )
+        return total[0]["total"], self._history_docs(rows)
+
+    async def ahistory_last_timestamp(
+        self, user_id: str, thread_id: str
+    ) -> Optional[datetime]:
+        """Return the time of the thread's newest write, or None if it has none."""
+        rows = await asyncio.to_thread(
+            self._query,
+            "SELECT MAX(timestamp) AS timestamp FROM writes "
+            "WHERE thread_id = ? AND user_id = ?",
+            (thread_id, user_id),
+        )
+        if not rows or rows[0]["timestamp"] is None:
+            return None
+        return datetime.fromisoformat(rows[0]["timestamp"])
+
+    async def ahistory_writes(
+        self, user_id: str, thread_id: str
+    ) -> builtins.list[dict[str, Any]]:
+        rows = await asyncio.to_thread(
+            self._query,
+            "SELECT thread_id, channel, type, value, timestamp, display FROM writes "
+            "WHERE thread_id = ? AND user_id = ? ORDER BY timestamp, rowid",
+            (thread_id, user_id),
+        )
+        return self._history_docs(rows)
@@ -0,0 +1,72 @@
+import re
+from typing import Any, Dict, Optional
+
+from langchain_core.messages import BaseMessage, RemoveMessage
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+
+
+def extract_response_content(text: str) -> str:
+    """Response 태그 안의 내용만 추출합니다."""
+    if not isinstance(text, str):
+        return text
+
+    # <response> 태그 안의 내용을 추출
+    pattern = r"<response>\s*(.*?)\s*</response>"
+    match = re.search(pattern, text, re.DOTALL)
+
+    if match:
+        return match.group(1).strip()
+
+    # <response> 태그가 없으면 원본 텍스트 반환
+    return text
+
+
+def message_title(value: Any) -> Any:
+    """Title of a thread: the content of the last message in its first history write."""
+    if not isinstance(value, list) or not value:
+        return None
+    item = value[-1]
+    if isinstance(item, dict) and "content" in item:
+        return item["content"]
+    return None
+
+
+def message_count(value: Any) -> int:
+    """Number of chat messages a history write adds to its thread.
+
+    RemoveMessage entries are not counted, and a compaction rewrite, which
+    clears the list with RemoveMessage(REMOVE_ALL_MESSAGES) and puts back
+    messages the thread already had, adds none.
+    """
+    if not isinstance(value, list):
+        return 1
+    removes = [item for item in value if isinstance(item, RemoveMessage)]
+    if any(item.id == REMOVE_ALL_MESSAGES for item in removes):
+        return 0
+    return len(value) - len(removes)
+
+
+def message_display(value: Any) -> Optional[Dict[str, Any]]:
+    """Plain-field projection of a write value for the chat history.
+
+    Like the history formatter, only the last item of a list value is shown.
+    A message object gives kind "message" with its class name as role, the
+    agent name, the text inside <response> tags and the names of its tool
+    calls. A plain {"role", "content"} dict, as sent by the API, gives kind
+    "text". Anything else is not shown and returns None.
+    """
+    if not isinstance(value, list) or not value:
+        return None
+    item = value[-1]
+    if isinstance(item, BaseMessage):
+        return {
+            "kind": "message",
+            "role": type(item).__name__,
+            "name": item.name,
+            "text": extract_response_content(item.content),
+            "tool_calls": [call["name"] for call in getattr(item, "tool_calls", [])],
+        }
+    title = message_title(value)
+    if title is None:
+        return None
+    return {"kind": "text", "role": item.get("role"), "text": title}
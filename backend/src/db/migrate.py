@@ -0,0 +1,125 @@
+import argparse
+import asyncio
+import logging
+from typing import Any
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+from ..config import MONGO_DB_NAME, MONGO_URI
+from .compression import get_blob_serde
+from .message_display import message_display
+from .mongodb_checkpoint import (
+    drop_superseded_indexes,
+    provision_indexes,
+    rebuild_thread_summaries,
+)
+
+logger = logging.getLogger(__name__)
+
+
+async def backfill_thread_summaries(
+    writes_collection: Any, summary_collection: Any
+) -> int:
+    """기존 메시지 쓰기 문서로 스레드 요약을 다시 만듭니다. 만든 요약 수를 반환합니다."""
+    return await rebuild_thread_summaries(
+        get_blob_serde(), writes_collection, summary_collection
+    )
+
+
+async def backfill_message_display(
+    writes_collection: Any, batch_size: int = 1000
+) -> int:
+    """display 필드가 없는 쓰기 문서에 display를 채웁니다. 갱신한 문서 수를 반환합니다."""
+    serde = get_blob_serde()
+    updated = 0
+    operations = []
+    cursor = writes_collection.find(
+        {"display": {"$exists": False}}, {"type": 1, "value": 1}
+    )
+    async for doc in cursor:
+        value = serde.loads_typed((doc["type"], doc["value"]))
+        operations.append(
+            UpdateOne(
+                {"_id": doc["_id"]}, {"$set": {"display": message_display(value)}}
+            )
+        )
+        if len(operations) >= batch_size:
+            await writes_collection.bulk_write(operations)
+            updated += len(operations)
+            operations = []
+    if operations:
+        await writes_collection.bulk_write(operations)
+        updated += len(operations)
+    return updated
+
+
+async def migrate(
+    checkpoint_collection: str,
+    writes_collection: str,
+    summary_collection: str,
+    backfill_summaries: bool = False,
+    backfill_display: bool = False,
+    drop_superseded: bool = False,
+) -> None:
+    """체크포인트 컬렉션의 인덱스를 생성합니다. 이미 있는 인덱스는 건너뜁니다.
+
+    drop_superseded가 True이면 새 인덱스를 만든 뒤 그것으로 대체된 기존 인덱스를
+    삭제합니다.
+    """
+    client = AsyncIOMotorClient(MONGO_URI)
+    try:
+        db = client[MONGO_DB_NAME]
+        await provision_indexes(
+            db, checkpoint_collection, writes_collection, summary_collection
+        )
+        logger.info("Checkpoint indexes are up to date.")
+        if drop_superseded:
+            dropped = await drop_superseded_indexes(
+                db, checkpoint_collection, writes_collection
+            )
+            logger.info(f"Dropped {len(dropped)} superseded indexes.")
+        if backfill_summaries:
+            count = await backfill_thread_summaries(
+                db[writes_collection], db[summary_collection]
+            )
+            logger.info(f"Backfilled {count} thread summaries.")
+        if backfill_display:
+            count = await backfill_message_display(db[writes_collection])
+            logger.info(f"Backfilled the display of {count} writes.")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create the checkpoint indexes.")
+    parser.add_argument("--checkpoint-collection", default="travel_planner_checkpoint")
+    parser.add_argument("--writes-collection", default="travel_planner_history")
+    parser.add_argument("--summary-collection", default="travel_planner_thread_summary")
+    parser.add_argument(
+        "--backfill-summaries",
+        action="store_true",
+        help="Rebuild the thread summaries from the stored message writes",
+    )
+    parser.add_argument(
+        "--backfill-display",
+        action="store_true",
+        help="Store the display fields of writes saved before they existed",
+    )
+    parser.add_argument(
+        "--drop-superseded-indexes",
+        action="store_true",
+        help="Drop the old indexes replaced by the current checkpoint indexes",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(
+        migrate(
+            args.checkpoint_collection,
+            args.writes_collection,
+            args.summary_collection,
+            args.backfill_summaries,
+            args.backfill_display,
+            args.drop_superseded_indexes,
+        )
+    )
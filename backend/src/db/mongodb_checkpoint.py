@@ -1,7 +1,9 @@
 import asyncio
-from collections.abc import AsyncIterator, Sequence
+import logging
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Callable, Collection, Sequence
 from contextlib import asynccontextmanager
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from importlib.metadata import version
 from typing import Any, Optional
 
@@ -12,17 +14,413 @@ from langgraph.checkpoint.base import (
     Checkpoint,
     CheckpointMetadata,
     CheckpointTuple,
+    copy_checkpoint,
     get_checkpoint_id,
 )
 from langgraph.checkpoint.mongodb import AsyncMongoDBSaver
 from langgraph.checkpoint.mongodb.utils import dumps_metadata, loads_metadata
+from langgraph.checkpoint.serde.base import SerializerProtocol
 from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo import UpdateOne
-from pymongo.asynchronous.mongo_client import AsyncMongoClient
+from pymongo import ASCENDING, DESCENDING, IndexModel, UpdateOne
 from pymongo.driver_info import DriverInfo
+from pymongo.write_concern import WriteConcern
+
+from .compression import BlobCodec, CompressingSerializer
+from .message_display import message_count, message_display, message_title
+
+logger = logging.getLogger(__name__)
+
+# Indexes follow the query shapes: every checkpoint and write lookup filters on
+# thread_id, user_id and checkpoint_ns, and a thread's history is read by
+# thread_id and user_id in timestamp order. The chat history listing reads the
+# summary collection instead of the writes.
+CHECKPOINT_INDEXES = [
+    IndexModel(
+        [
+            ("thread_id", ASCENDING),
+            ("user_id", ASCENDING),
+            ("checkpoint_ns", ASCENDING),
+            ("checkpoint_id", DESCENDING),
+        ],
+        name="thread_user_ns_checkpoint",
+        unique=True,
+    ),
+    # Covers the retention pass that finds idle threads by their newest timestamp.
+    IndexModel(
+        [("thread_id", ASCENDING), ("user_id", ASCENDING), ("timestamp", DESCENDING)],
+        name="thread_user_timestamp",
+    ),
+]
+WRITES_INDEXES = [
+    IndexModel(
+        [
+            ("thread_id", ASCENDING),
+            ("user_id", ASCENDING),
+            ("checkpoint_ns", ASCENDING),
+            ("checkpoint_id", DESCENDING),
+            ("task_id", ASCENDING),
+            ("idx", ASCENDING),
+        ],
+        name="thread_user_ns_checkpoint_task_idx",
+        unique=True,
+    ),
+    IndexModel(
+        [("thread_id", ASCENDING), ("user_id", ASCENDING), ("timestamp", ASCENDING)],
+        name="thread_user_timestamp",
+    ),
+]
+# One summary per thread, listed per user by first message time with thread_id
+# as the tie-breaker of the keyset cursor.
+SUMMARY_INDEXES = [
+    IndexModel(
+        [("thread_id", ASCENDING), ("user_id", ASCENDING)],
+        name="thread_user",
+        unique=True,
+    ),
+    IndexModel(
+        [
+            ("user_id", ASCENDING),
+            ("first_timestamp", DESCENDING),
+            ("thread_id", DESCENDING),
+        ],
+        name="user_first_timestamp_thread",
+    ),
+]
+# Key patterns of indexes the ones above replace: the langgraph-checkpoint-mongodb
+# defaults, which do not lead with user_id, and the history listing index that
+# the summary collection made unnecessary. They are dropped only on request by
+# the migration command, after the replacements exist.
+SUPERSEDED_CHECKPOINT_INDEXES = [
+    (("thread_id", 1), ("checkpoint_ns", 1), ("checkpoint_id", -1)),
+]
+SUPERSEDED_WRITES_INDEXES = [
+    (
+        ("thread_id", 1),
+        ("checkpoint_ns", 1),
+        ("checkpoint_id", -1),
+        ("task_id", 1),
+        ("user_id", 1),
+        ("idx", 1),
+    ),
+    (
+        ("thread_id", 1),
+        ("checkpoint_ns", 1),
+        ("checkpoint_id", -1),
+        ("task_id", 1),
+        ("idx", 1),
+    ),
+    (("user_id", 1), ("channel", 1), ("timestamp", 1)),
+]
+# Number of checkpoints whose pending writes alist() fetches with one query.
+LIST_BATCH_SIZE = 100
+# Writes on this channel are what history_service reads to rebuild a chat, so
+# pruning old checkpoints keeps them.
+HISTORY_CHANNEL = "messages"
+# Write concerns selectable per kind of checkpoint write. "default" keeps the
+# client's write concern; "fast" is unacknowledged and can lose in-flight writes.
+DURABILITY_TIERS = {
+    "default": None,
+    "fast": WriteConcern(w=0),
+    "acknowledged": WriteConcern(w=1, j=False),
+    "journaled": WriteConcern(w=1, j=True),
+    "majority": WriteConcern(w="majority"),
+}
+# (database, collection) pairs whose indexes were created or verified by this
+# process; later savers on the same collections skip the list_indexes round trip.
+_indexed_collections: set[tuple[str, str]] = set()
+# Number of recently written or read checkpoints whose delta chain position is
+# remembered, so the next aput() can be written as a delta of its parent.
+DELTA_HEADS_CACHE_SIZE = 1024
+
+
+def _index_keys(keys: Any) -> tuple:
+    return tuple((field, int(direction)) for field, direction in keys)
+
+
+async def _missing_indexes(
+    collection: Any, indexes: list[IndexModel]
+) -> list[IndexModel]:
+    existing = {
+        _index_keys(info["key"])
+        for info in (await collection.index_information()).values()
+    }
+    return [
+        index
+        for index in indexes
+        if _index_keys(index.document["key"].items()) not in existing
+    ]
+
+
+async def _ensure_indexes(collection: Any, indexes: list[IndexModel]) -> None:
+    """Create the indexes whose key pattern does not exist on the collection yet."""
+    missing = await _missing_indexes(collection, indexes)
+    if missing:
+        await collection.create_indexes(missing)
+        logger.info(
+            f"Created indexes on {collection.name}: "
+            f"{[index.document['name'] for index in missing]}"
+        )
+
+
+async def _verify_indexes(collection: Any, indexes: list[IndexModel]) -> None:
+    """Raise if an index the queries rely on does not exist on the collection."""
+    missing = await _missing_indexes(collection, indexes)
+    if missing:
+        raise RuntimeError(
+            f"Missing indexes on {collection.name}: "
+            f"{[index.document['name'] for index in missing]}. "
+            "Run `python -m src.db.migrate` to create them."
+        )
+
+
+async def provision_indexes(
+    db: Any,
+    checkpoint_collection: str,
+    writes_collection: str,
+    summary_collection: Optional[str] = None,
+) -> None:
+    """Create the checkpoint, writes and thread summary indexes. Used by the migration command."""
+    await _ensure_indexes(db[checkpoint_collection], CHECKPOINT_INDEXES)
+    await _ensure_indexes(db[writes_collection], WRITES_INDEXES)
+    if summary_collection:
+        await _ensure_indexes(db[summary_collection], SUMMARY_INDEXES)
+
+
+async def _drop_indexes(collection: Any, key_patterns: list[tuple]) -> list[str]:
+    """Drop the indexes whose key pattern is in `key_patterns`. Returns their names."""
+    dropped = []
+    for name, info in (await collection.index_information()).items():
+        if _index_keys(info["key"]) in key_patterns:
+            await collection.drop_index(name)
+            dropped.append(name)
+    if dropped:
+        logger.info(f"Dropped superseded indexes on {collection.name}: {dropped}")
+    return dropped
+
+
+async def drop_superseded_indexes(
+    db: Any, checkpoint_collection: str, writes_collection: str
+) -> list[str]:
+    """Drop the indexes replaced by CHECKPOINT_INDEXES and WRITES_INDEXES.
+
+    Call it after provision_indexes() so the queries never run without an index.
+    Returns the names of the dropped indexes.
+    """
+    return [
+        *await _drop_indexes(db[checkpoint_collection], SUPERSEDED_CHECKPOINT_INDEXES),
+        *await _drop_indexes(db[writes_collection], SUPERSEDED_WRITES_INDEXES),
+    ]
+
+
+def _message_patch(parent: Any, messages: Any) -> Optional[dict[str, list]]:
+    """Describe `messages` as the `parent` list minus some messages plus new ones.
+
+    Returns None when the list was reordered or a kept message was replaced, so
+    the caller stores the whole list instead.
+    """
+    if not isinstance(parent, list) or not isinstance(messages, list):
+        return None
+    ids = [getattr(message, "id", None) for message in messages]
+    if None in ids or any(getattr(m, "id", None) is None for m in parent):
+        return None
+    new_ids = set(ids)
+    kept = [message for message in parent if message.id in new_ids]
+    if any(a is not b and a != b for a, b in zip(kept, messages)):
+        return None
+    return {
+        "removed": [message.id for message in parent if message.id not in new_ids],
+        "appended": messages[len(kept) :],
+    }
+
+
+def _apply_message_patches(messages: list, patches: list[dict]) -> list:
+    """Apply patches from _message_patch(), newest first, to the base list."""
+    for patch in reversed(patches):
+        removed = set(patch["removed"])
+        messages = [m for m in messages if m.id not in removed] + patch["appended"]
+    return messages
+
+
+async def rebuild_thread_summaries(
+    serde: SerializerProtocol, writes_collection: Any, summary_collection: Any
+) -> int:
+    """Rebuild the thread summaries from the stored root history writes.
+
+    Reads every history write once, so it is meant for migrations. Returns the
+    number of summaries written.
+    """
+    summaries: dict[tuple[str, str], dict[str, Any]] = {}
+    cursor = writes_collection.find(
+        {"channel": HISTORY_CHANNEL, "checkpoint_ns": ""}
+    ).sort("timestamp", 1)
+    async for doc in cursor:
+        value = serde.loads_typed((doc["type"], doc["value"]))
+        key = (doc["thread_id"], doc["user_id"])
+        if key not in summaries:
+            summaries[key] = {
+                "title": message_title(value),
+                "first_timestamp": doc["timestamp"],
+                "last_timestamp": doc["timestamp"],
+                "message_count": message_count(value),
+            }
+            continue
+        summaries[key]["last_timestamp"] = doc["timestamp"]
+        summaries[key]["message_count"] += message_count(value)
+
+    operations = [
+        UpdateOne(
+            {"thread_id": thread_id, "user_id": user_id}, {"$set": summary}, upsert=True
+        )
+        for (thread_id, user_id), summary in summaries.items()
+    ]
+    if operations:
+        await summary_collection.bulk_write(operations)
+    return len(operations)
+
+
+def _inserted(result: Any, count: int) -> set[int]:
+    """Positions of the bulk_write upserts that inserted a document.
+
+    An unacknowledged write concern reports nothing, so every upsert is counted.
+    """
+    if not result.acknowledged:
+        return set(range(count))
+    return set(result.upserted_ids)
+
+
+def _doc_key(doc: dict) -> tuple:
+    return doc["thread_id"], doc["user_id"], doc["checkpoint_ns"], doc["checkpoint_id"]
+
+
+def _plan_stages(plan: Any) -> set[str]:
+    """Collect every stage name in an explain() plan tree."""
+    if isinstance(plan, list):
+        return set().union(*(_plan_stages(item) for item in plan))
+    if not isinstance(plan, dict):
+        return set()
+    stages = {plan["stage"]} if isinstance(plan.get("stage"), str) else set()
+    return stages.union(*(_plan_stages(value) for value in plan.values()))
 
 
 class CustomAsyncMongoDBSaver(AsyncMongoDBSaver):
+    """MongoDB checkpointer scoped by user_id.
+
+    With storage_mode="delta" a checkpoint only stores the channel values that
+    changed since its parent, and every `snapshot_interval`-th checkpoint of a
+    chain is a full snapshot. The HISTORY_CHANNEL list is stored as a patch of
+    the parent's list (ids of removed messages and the appended messages), so a
+    step that adds one message stores one message. Delta documents carry
+    `snapshot_id`, so reading one takes at most one extra range query over its
+    ancestors. Documents written in "full" mode have no `snapshot_id` and load
+    as before.
+
+    With a `codec`, checkpoint and write blobs are compressed and the algorithm
+    is tagged in the stored `type`.
+
+    With `cache_size` > 0 the latest checkpoint tuple of each thread/namespace is
+    kept in an LRU cache that aput() and aput_writes() keep current, so reading
+    it back skips Mongo. The cache assumes a thread is only written through this
+    process; call invalidate() after writing to the collections any other way.
+    With `write_behind_interval`, aput_writes() buffers its upserts and sends
+    them in one bulk_write when the interval elapses or at the next aput(), so
+    every write of a step is stored before the checkpoint that follows it.
+
+    `checkpoint_durability`, `subgraph_durability` and `writes_durability` pick a
+    DURABILITY_TIERS write concern for checkpoints of the root graph, checkpoints
+    of subgraphs (non-empty checkpoint_ns) and pending writes respectively.
+
+    With a `summary_collection_name`, every history write also upserts a per-thread
+    summary (title, first and last timestamps, message count) that the chat list
+    is served from. abackfill_summaries() builds them once for threads written
+    before the collection existed.
+
+    Every write also stores `display`, the message_display() projection of its
+    value (role, agent name, display text), so the chat history is read without
+    decoding blobs.
+
+    `on_history_change(thread_id, user_id)` is called whenever writes of a thread
+    are stored or deleted (user_id is None for all users), so caches built from
+    the chat history can be invalidated.
+
+    With `create_indexes=False` the saver only checks that the indexes exist and
+    fails at startup otherwise; `python -m src.db.migrate` creates them.
+    """
+
+    def __init__(
+        self,
+        client: AsyncIOMotorClient,
+        db_name: str = "checkpointing_db",
+        checkpoint_collection_name: str = "checkpoints_aio",
+        writes_collection_name: str = "checkpoint_writes_aio",
+        storage_mode: str = "full",
+        snapshot_interval: int = 10,
+        codec: Optional[BlobCodec] = None,
+        cache_size: int = 0,
+        write_behind_interval: Optional[float] = None,
+        checkpoint_durability: str = "default",
+        subgraph_durability: str = "default",
+        writes_durability: str = "default",
+        create_indexes: bool = True,
+        summary_collection_name: Optional[str] = None,
+        on_history_change: Optional[Callable[[str, Optional[str]], None]] = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(
+            client,
+            db_name,
+            checkpoint_collection_name,
+            writes_collection_name,
+            **kwargs,
+        )
+        if codec is not None:
+            self.serde = CompressingSerializer(self.serde, codec)
+        self.create_indexes = create_indexes
+        self.storage_mode = storage_mode
+        self._root_checkpoints = self._with_durability(
+            self.checkpoint_collection, checkpoint_durability
+        )
+        self._subgraph_checkpoints = self._with_durability(
+            self.checkpoint_collection, subgraph_durability
+        )
+        self._durable_writes = self._with_durability(
+            self.writes_collection, writes_durability
+        )
+        self.summary_collection = (
+            self.db[summary_collection_name] if summary_collection_name else None
+        )
+        self._durable_summaries = (
+            self._with_durability(self.summary_collection, writes_durability)
+            if self.summary_collection is not None
+            else None
+        )
+        self.snapshot_interval = snapshot_interval
+        # (thread_id, user_id, checkpoint_ns, checkpoint_id) ->
+        # (snapshot_id, delta_depth, channel_versions, channel names, messages)
+        self._delta_heads: OrderedDict[tuple, tuple] = OrderedDict()
+        self.cache_size = cache_size
+        # (thread_id, user_id, checkpoint_ns) ->
+        # (latest CheckpointTuple, {(task_id, idx): pending write})
+        self._latest: OrderedDict[tuple, tuple] = OrderedDict()
+        self.write_behind_interval = write_behind_interval
+        self._buffered_writes: list[UpdateOne] = []
+        # (offset of the call's upserts in _buffered_writes, config, writes)
+        self._buffered_summaries: list[tuple[int, RunnableConfig, Sequence]] = []
+        # summary upserts whose writes are stored but that were not sent yet
+        self._unsent_summaries: list[UpdateOne] = []
+        self._buffered_threads: set[tuple[str, str]] = set()
+        self.on_history_change = on_history_change
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _with_durability(collection: Any, tier: str) -> Any:
+        if tier not in DURABILITY_TIERS:
+            raise ValueError(
+                f"Unknown durability tier '{tier}', expected one of {list(DURABILITY_TIERS)}"
+            )
+        if DURABILITY_TIERS[tier] is None:
+            return collection
+        return collection.with_options(write_concern=DURABILITY_TIERS[tier])
 
     @classmethod
     @asynccontextmanager
@@ -38,6 +436,7 @@ class CustomAsyncMongoDBSaver(AsyncMongoDBSaver):
         This includes creation of collections and indexes if they don't exist
         """
         client: Optional[AsyncIOMotorClient] = None
+        saver: Optional[CustomAsyncMongoDBSaver] = None
         try:
             client = AsyncIOMotorClient(
                 conn_string,
@@ -55,101 +454,694 @@ class CustomAsyncMongoDBSaver(AsyncMongoDBSaver):
             await saver._setup()
             yield saver
         finally:
+            if saver:
+                await saver.aflush()
             if client:
                 client.close()
 
+    @classmethod
+    @asynccontextmanager
+    async def from_client(
+        cls,
+        client: AsyncIOMotorClient,
+        db_name: str = "checkpointing_db",
+        checkpoint_collection_name: str = "checkpoints_aio",
+        writes_collection_name: str = "checkpoint_writes_aio",
+        **kwargs: Any,
+    ) -> AsyncIterator["CustomAsyncMongoDBSaver"]:
+        """Create asynchronous checkpointer on an existing client
+        The client and its connection pool stay owned by the caller and are not closed.
+        """
+        saver = CustomAsyncMongoDBSaver(
+            client,
+            db_name,
+            checkpoint_collection_name,
+            writes_collection_name,
+            **kwargs,
+        )
+        await saver._setup()
+        try:
+            yield saver
+        finally:
+            await saver.aflush()
+
     async def _setup(self):
-        """Create indexes if not present."""
+        """Create indexes if not present, or only verify them when `create_indexes` is False.
+        This runs once per collection and process, so requests never list indexes.
+        """
         if self._setup_future is not None:
             return await self._setup_future
-        self._setup_future = asyncio.Future()
-        if isinstance(self.client, AsyncMongoClient):
-            num_indexes = len(
-                await (await self.checkpoint_collection.list_indexes()).to_list()
-            )
-        else:
-            num_indexes = len(await self.checkpoint_collection.list_indexes().to_list())
-        if num_indexes < 2:
-            await self.checkpoint_collection.create_index(
-                keys=[("thread_id", 1), ("checkpoint_ns", 1), ("checkpoint_id", -1)],
-                unique=True,
+        self._setup_future = asyncio.get_running_loop().create_future()
+        try:
+            collections = [
+                (self.checkpoint_collection, CHECKPOINT_INDEXES),
+                (self.writes_collection, WRITES_INDEXES),
+            ]
+            if self.summary_collection is not None:
+                collections.append((self.summary_collection, SUMMARY_INDEXES))
+            for collection, indexes in collections:
+                key = (self.db.name, collection.name)
+                if key in _indexed_collections:
+                    continue
+                if self.create_indexes:
+                    await _ensure_indexes(collection, indexes)
+                else:
+                    await _verify_indexes(collection, indexes)
+                _indexed_collections.add(key)
+        except Exception as e:
+            self._setup_future.set_exception(e)
+            # let the next call retry instead of failing forever
+            future, self._setup_future = self._setup_future, None
+            return await future
+        self._setup_future.set_result(None)
+
+    async def abackfill_summaries(self) -> int:
+        """Build the thread summaries once when history writes exist without any.
+
+        Threads written before the summary collection existed are otherwise
+        missing from the chat list. Returns the number of summaries written.
+        """
+        await self._setup()
+        if self.summary_collection is None:
+            return 0
+        if await self.summary_collection.find_one({}, {"_id": 1}) is not None:
+            return 0
+        if (
+            await self.writes_collection.find_one(
+                {"channel": HISTORY_CHANNEL, "checkpoint_ns": ""}, {"_id": 1}
             )
-        if isinstance(self.client, AsyncMongoClient):
-            num_indexes = len(
-                await (await self.writes_collection.list_indexes()).to_list()
+            is None
+        ):
+            return 0
+        count = await rebuild_thread_summaries(
+            self.serde, self.writes_collection, self.summary_collection
+        )
+        logger.info(f"Backfilled {count} thread summaries")
+        return count
+
+    async def check_query_plans(self) -> list[str]:
+        """Run explain() on the query shapes used per request and report collection scans.
+
+        Returns:
+            list[str]: Names of the query shapes whose winning plan is a COLLSCAN.
+        """
+        probe = {"thread_id": "", "user_id": "", "checkpoint_ns": ""}
+        query_shapes = {
+            "latest checkpoint": self.checkpoint_collection.find(probe)
+            .sort("checkpoint_id", -1)
+            .limit(1),
+            "checkpoint by id": self.checkpoint_collection.find(
+                {**probe, "checkpoint_id": ""}
+            ),
+            "pending writes": self.writes_collection.find(
+                {**probe, "checkpoint_id": ""}
+            ),
+            "history by thread": self.writes_collection.find(
+                {"thread_id": "", "user_id": ""}
+            ).sort("timestamp", 1),
+        }
+        if self.summary_collection is not None:
+            query_shapes["thread summaries by user"] = self.summary_collection.find(
+                {"user_id": ""}
+            ).sort([("first_timestamp", -1), ("thread_id", -1)])
+        collection_scans = []
+        for name, cursor in query_shapes.items():
+            plan = await cursor.explain()
+            if "COLLSCAN" in _plan_stages(plan.get("queryPlanner", {})):
+                logger.warning(f"Checkpoint query '{name}' uses a collection scan")
+                collection_scans.append(name)
+        if not collection_scans:
+            logger.info("All checkpoint query shapes use an index")
+        return collection_scans
+
+    async def aprune_checkpoints(self, keep_last: int) -> int:
+        """Delete all but the newest `keep_last` root checkpoints of every thread.
+        Writes of the pruned checkpoints are deleted as well, except the ones on
+        HISTORY_CHANNEL that the chat history is built from. Delta checkpoints
+        keep the ancestors back to their snapshot.
+        Every sub-agent run gets its own namespace, so subgraph checkpoints are
+        pruned with the root step they ran in: namespaces older than the oldest
+        kept root checkpoint are deleted with all of their writes.
+        Returns:
+            int: The number of deleted checkpoints.
+        """
+        await self._setup()
+        # Sorting on the index prefix and projecting only its fields makes the
+        # group an index-only scan that never touches the checkpoint blobs.
+        groups = self.checkpoint_collection.aggregate(
+            [
+                {"$match": {"checkpoint_ns": ""}},
+                {"$sort": {"thread_id": 1, "user_id": 1, "checkpoint_ns": 1}},
+                {"$project": {"_id": 0, "thread_id": 1, "user_id": 1}},
+                {
+                    "$group": {
+                        "_id": {"thread_id": "$thread_id", "user_id": "$user_id"},
+                        "count": {"$sum": 1},
+                    }
+                },
+                {"$match": {"count": {"$gt": keep_last}}},
+            ],
+            hint="thread_user_ns_checkpoint",
+        )
+        pruned = 0
+        async for group in groups:
+            thread = group["_id"]
+            root = {**thread, "checkpoint_ns": ""}
+            kept = await (
+                self.checkpoint_collection.find(
+                    root, {"checkpoint_id": 1, "snapshot_id": 1}
+                )
+                .sort("checkpoint_id", -1)
+                .limit(keep_last)
+                .to_list(length=keep_last)
             )
-        else:
-            num_indexes = len(await self.writes_collection.list_indexes().to_list())
-        if num_indexes < 2:
-            await self.writes_collection.create_index(
-                keys=[
-                    ("thread_id", 1),
-                    ("checkpoint_ns", 1),
-                    ("checkpoint_id", -1),
-                    ("task_id", 1),
-                    ("user_id", 1),
-                    ("idx", 1),
-                ],
-                unique=True,
+            if not kept:
+                continue
+            cutoff = min(doc.get("snapshot_id") or doc["checkpoint_id"] for doc in kept)
+            older = {**root, "checkpoint_id": {"$lt": cutoff}}
+            result = await self.checkpoint_collection.delete_many(older)
+            await self.writes_collection.delete_many(
+                {**older, "channel": {"$ne": HISTORY_CHANNEL}}
             )
-        self._setup_future.set_result(None)
+            pruned += result.deleted_count
+            # Checkpoint ids are time ordered and a subgraph runs within one root
+            # step, so a namespace lies entirely before or after the cutoff.
+            older_subgraphs = {
+                **thread,
+                "checkpoint_ns": {"$gt": ""},
+                "checkpoint_id": {"$lt": cutoff},
+            }
+            result = await self.checkpoint_collection.delete_many(older_subgraphs)
+            await self.writes_collection.delete_many(older_subgraphs)
+            pruned += result.deleted_count
+            for key in list(self._latest):
+                if key[:2] == (thread["thread_id"], thread["user_id"]) and key[2]:
+                    del self._latest[key]
+            self._history_changed(thread["thread_id"], thread["user_id"])
+        return pruned
 
-    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+    async def aexpire_threads(self, ttl: timedelta) -> int:
+        """Delete every checkpoint and write of threads idle for longer than `ttl`.
+        A thread's last activity is the newest checkpoint timestamp across all of
+        its namespaces, so an active thread never loses old documents.
+        Returns:
+            int: The number of deleted threads.
+        """
         await self._setup()
-        thread_id = config["configurable"]["thread_id"]
-        user_id = config["configurable"]["user_id"]
-        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
-        if checkpoint_id := get_checkpoint_id(config):
-            query = {
-                "thread_id": thread_id,
-                "user_id": user_id,
-                "checkpoint_ns": checkpoint_ns,
-                "checkpoint_id": checkpoint_id,
-            }
-        else:
-            query = {
+        cutoff = datetime.now(tz=timezone.utc) - ttl
+        threads = self.checkpoint_collection.aggregate(
+            [
+                {"$sort": {"thread_id": 1, "user_id": 1, "timestamp": -1}},
+                {"$project": {"_id": 0, "thread_id": 1, "user_id": 1, "timestamp": 1}},
+                {
+                    "$group": {
+                        "_id": {"thread_id": "$thread_id", "user_id": "$user_id"},
+                        "last_activity": {"$first": "$timestamp"},
+                    }
+                },
+                {"$match": {"last_activity": {"$lt": cutoff}}},
+            ],
+            hint="thread_user_timestamp",
+        )
+        expired = 0
+        async for thread in threads:
+            self.invalidate(**thread["_id"])
+            self._history_changed(**thread["_id"])
+            await self.checkpoint_collection.delete_many(thread["_id"])
+            await self.writes_collection.delete_many(thread["_id"])
+            if self.summary_collection is not None:
+                await self.summary_collection.delete_many(thread["_id"])
+            expired += 1
+        return expired
+
+    async def run_retention(
+        self, keep_last: int, thread_ttl: Optional[timedelta], interval: float
+    ) -> None:
+        """Apply the retention policy every `interval` seconds until cancelled.
+        Args:
+            keep_last (int): Root checkpoints to keep per thread. 0 keeps all.
+            thread_ttl (Optional[timedelta]): Idle time after which a thread is deleted. None keeps all threads.
+            interval (float): Seconds between two runs.
+        """
+        while True:
+            try:
+                if thread_ttl is not None:
+                    expired = await self.aexpire_threads(thread_ttl)
+                    if expired:
+                        logger.info(f"Expired {expired} idle threads")
+                if keep_last > 0:
+                    pruned = await self.aprune_checkpoints(keep_last)
+                    if pruned:
+                        logger.info(f"Pruned {pruned} old checkpoints")
+            except Exception as e:
+                logger.exception(f"Checkpoint retention failed: {e}")
+            await asyncio.sleep(interval)
+
+    def _remember_head(self, key: tuple, head: tuple) -> None:
+        self._delta_heads[key] = head
+        self._delta_heads.move_to_end(key)
+        while len(self._delta_heads) > DELTA_HEADS_CACHE_SIZE:
+            self._delta_heads.popitem(last=False)
+
+    def _encode_checkpoint(
+        self, config: RunnableConfig, checkpoint: Checkpoint
+    ) -> tuple[str, bytes, dict[str, Any]]:
+        """Serialize a checkpoint for aput(), as a delta of its parent when possible.
+        Returns the serde type, the payload and the delta fields of the document.
+        A snapshot is written when the parent's chain position is unknown to this
+        process or the chain reached `snapshot_interval`.
+        """
+        configurable = config["configurable"]
+        scope = (
+            configurable["thread_id"],
+            configurable["user_id"],
+            configurable["checkpoint_ns"],
+        )
+        channel_values = checkpoint["channel_values"]
+        channel_versions = checkpoint["channel_versions"]
+        channels = list(channel_values)
+        if self.storage_mode != "delta":
+            type_, serialized = self.serde.dumps_typed(checkpoint)
+            return type_, serialized, {}
+        messages = channel_values.get(HISTORY_CHANNEL)
+        parent = self._delta_heads.get((*scope, configurable.get("checkpoint_id")))
+        if parent is None or parent[1] + 1 >= self.snapshot_interval:
+            self._remember_head(
+                (*scope, checkpoint["id"]),
+                (checkpoint["id"], 0, channel_versions, set(channels), messages),
+            )
+            type_, serialized = self.serde.dumps_typed(checkpoint)
+            return type_, serialized, {"snapshot_id": None, "delta_depth": 0}
+        snapshot_id, depth, parent_versions, parent_channels, parent_messages = parent
+        changed = {
+            channel: value
+            for channel, value in channel_values.items()
+            if channel not in parent_channels
+            or channel_versions.get(channel) != parent_versions.get(channel)
+        }
+        patched_channels = []
+        if HISTORY_CHANNEL in changed and HISTORY_CHANNEL in parent_channels:
+            patch = _message_patch(parent_messages, messages)
+            if patch is not None:
+                changed[HISTORY_CHANNEL] = patch
+                patched_channels.append(HISTORY_CHANNEL)
+        self._remember_head(
+            (*scope, checkpoint["id"]),
+            (snapshot_id, depth + 1, channel_versions, set(channels), messages),
+        )
+        type_, serialized = self.serde.dumps_typed(
+            {**checkpoint, "channel_values": changed}
+        )
+        return (
+            type_,
+            serialized,
+            {
+                "snapshot_id": snapshot_id,
+                "delta_depth": depth + 1,
+                "channels": channels,
+                "patched_channels": patched_channels,
+            },
+        )
+
+    async def _load_checkpoints(self, docs: list[dict]) -> list[Checkpoint]:
+        """Deserialize checkpoint documents, rebuilding delta ones from their ancestors.
+        The ancestors of every delta document in `docs` are fetched with a single
+        range query per thread, bounded by the oldest snapshot they depend on.
+        """
+        known = {_doc_key(doc): doc for doc in docs}
+        ranges: dict[tuple, tuple[str, str]] = {}
+        for doc in docs:
+            if not doc.get("snapshot_id"):
+                continue
+            scope = _doc_key(doc)[:3]
+            low, high = ranges.get(scope, (doc["snapshot_id"], doc["checkpoint_id"]))
+            ranges[scope] = (
+                min(low, doc["snapshot_id"]),
+                max(high, doc["checkpoint_id"]),
+            )
+        clauses = [
+            {
                 "thread_id": thread_id,
                 "user_id": user_id,
                 "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": {"$gte": low, "$lt": high},
             }
-        result = self.checkpoint_collection.find(
-            query, sort=[("checkpoint_id", -1)], limit=1
+            for (thread_id, user_id, checkpoint_ns), (low, high) in ranges.items()
+        ]
+        if clauses:
+            query = clauses[0] if len(clauses) == 1 else {"$or": clauses}
+            async for doc in self.checkpoint_collection.find(query, {"metadata": 0}):
+                known.setdefault(_doc_key(doc), doc)
+
+        decoded: dict[tuple, Checkpoint] = {}
+
+        def decode(key: tuple) -> Checkpoint:
+            if key not in decoded:
+                doc = known[key]
+                decoded[key] = self.serde.loads_typed((doc["type"], doc["checkpoint"]))
+            return decoded[key]
+
+        checkpoints = []
+        for doc in docs:
+            key = _doc_key(doc)
+            checkpoint = dict(decode(key))
+            if doc.get("snapshot_id"):
+                channel_values: dict[str, Any] = {}
+                # channel -> patches found so far, newest first
+                patches: dict[str, list[dict]] = {}
+                ancestor, values = doc, checkpoint["channel_values"]
+                while True:
+                    patched = (
+                        ancestor.get("patched_channels", [])
+                        if ancestor.get("snapshot_id")
+                        else []
+                    )
+                    for channel, value in values.items():
+                        if channel in channel_values:
+                            continue
+                        if channel in patched:
+                            patches.setdefault(channel, []).append(value)
+                        else:
+                            channel_values[channel] = _apply_message_patches(
+                                value, patches.pop(channel, [])
+                            )
+                    if not ancestor.get("snapshot_id"):
+                        break
+                    parent_key = (*key[:3], ancestor["parent_checkpoint_id"])
+                    if parent_key not in known:
+                        raise ValueError(
+                            f"Checkpoint {ancestor['checkpoint_id']} is missing its "
+                            f"parent {parent_key[3]}"
+                        )
+                    ancestor = known[parent_key]
+                    values = decode(parent_key)["channel_values"]
+                checkpoint["channel_values"] = {
+                    channel: channel_values[channel]
+                    for channel in doc["channels"]
+                    if channel in channel_values
+                }
+            if self.storage_mode == "delta":
+                self._remember_head(
+                    key,
+                    (
+                        doc.get("snapshot_id") or doc["checkpoint_id"],
+                        doc.get("delta_depth", 0),
+                        checkpoint["channel_versions"],
+                        set(checkpoint["channel_values"]),
+                        checkpoint["channel_values"].get(HISTORY_CHANNEL),
+                    ),
+                )
+            checkpoints.append(checkpoint)
+        return checkpoints
+
+    def _cached_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        configurable = config["configurable"]
+        key = (
+            configurable["thread_id"],
+            configurable["user_id"],
+            configurable.get("checkpoint_ns", ""),
         )
-        async for doc in result:
-            config_values = {
+        if key not in self._latest:
+            return None
+        checkpoint_tuple, writes = self._latest[key]
+        checkpoint_id = get_checkpoint_id(config)
+        if checkpoint_id and checkpoint_id != checkpoint_tuple.checkpoint["id"]:
+            return None
+        self._latest.move_to_end(key)
+        # the pregel loop mutates the checkpoint it loads, so hand out copies
+        return checkpoint_tuple._replace(
+            checkpoint=copy_checkpoint(checkpoint_tuple.checkpoint),
+            metadata=dict(checkpoint_tuple.metadata),
+            pending_writes=list(writes.values()),
+        )
+
+    def _cache_tuple(
+        self, checkpoint_tuple: CheckpointTuple, writes: dict[tuple, tuple]
+    ) -> None:
+        """Cache the latest checkpoint of a thread with its writes keyed by (task_id, idx)."""
+        if self.cache_size <= 0:
+            return
+        configurable = checkpoint_tuple.config["configurable"]
+        key = (
+            configurable["thread_id"],
+            configurable["user_id"],
+            configurable["checkpoint_ns"],
+        )
+        self._latest[key] = (
+            checkpoint_tuple._replace(
+                checkpoint=copy_checkpoint(checkpoint_tuple.checkpoint)
+            ),
+            dict(writes),
+        )
+        self._latest.move_to_end(key)
+        while len(self._latest) > self.cache_size:
+            self._latest.popitem(last=False)
+
+    def _cache_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        replace: bool,
+    ) -> None:
+        """Mirror an aput_writes() upsert on the cached tuple of its checkpoint."""
+        configurable = config["configurable"]
+        key = (
+            configurable["thread_id"],
+            configurable["user_id"],
+            configurable["checkpoint_ns"],
+        )
+        if key not in self._latest:
+            return
+        checkpoint_tuple, cached_writes = self._latest[key]
+        if checkpoint_tuple.checkpoint["id"] != configurable["checkpoint_id"]:
+            return
+        for idx, (channel, value) in enumerate(writes):
+            write_key = (task_id, WRITES_IDX_MAP.get(channel, idx))
+            if replace or write_key not in cached_writes:
+                cached_writes[write_key] = (task_id, channel, value)
+
+    def invalidate(
+        self,
+        thread_id: str,
+        user_id: Optional[str] = None,
+        checkpoint_ns: Optional[str] = None,
+    ) -> None:
+        """Drop cached checkpoints of a thread, optionally narrowed to a user or namespace."""
+        for key in list(self._latest):
+            if key[0] != thread_id:
+                continue
+            if user_id is not None and key[1] != user_id:
+                continue
+            if checkpoint_ns is not None and key[2] != checkpoint_ns:
+                continue
+            del self._latest[key]
+
+    def _history_changed(self, thread_id: str, user_id: Optional[str] = None) -> None:
+        if self.on_history_change is not None:
+            self.on_history_change(thread_id, user_id)
+
+    async def aflush(self) -> None:
+        """Send buffered aput_writes() upserts to Mongo in one bulk_write per collection.
+        Thread summaries are updated after the writes, so only the writes that
+        were inserted are counted.
+        """
+        async with self._flush_lock:
+            operations, self._buffered_writes = self._buffered_writes, []
+            pending, self._buffered_summaries = self._buffered_summaries, []
+            summaries, self._unsent_summaries = self._unsent_summaries, []
+            threads, self._buffered_threads = self._buffered_threads, set()
+            try:
+                if operations:
+                    inserted = _inserted(
+                        await self._durable_writes.bulk_write(operations),
+                        len(operations),
+                    )
+                    operations = []
+                    for offset, config, writes in pending:
+                        summary = self._summary_update(
+                            config,
+                            writes,
+                            {index - offset for index in inserted},
+                        )
+                        if summary is not None:
+                            summaries.append(summary)
+                    pending = []
+                for thread_id, user_id in threads:
+                    self._history_changed(thread_id, user_id)
+                threads = set()
+                if summaries:
+                    await self._durable_summaries.bulk_write(summaries)
+            except Exception:
+                # summaries buffered meanwhile point past the re-queued upserts
+                self._buffered_summaries = pending + [
+                    (offset + len(operations), config, writes)
+                    for offset, config, writes in self._buffered_summaries
+                ]
+                self._buffered_writes = operations + self._buffered_writes
+                self._unsent_summaries = summaries + self._unsent_summaries
+                self._buffered_threads |= threads
+                raise
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.write_behind_interval)
+        try:
+            await self.aflush()
+        except Exception as e:
+            logger.exception(f"Write-behind flush failed, retrying at next step: {e}")
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        """Delete all checkpoints and writes of a thread and drop it from the cache."""
+        await self.aflush()
+        self.invalidate(thread_id)
+        self._history_changed(thread_id)
+        await super().adelete_thread(thread_id)
+        if self.summary_collection is not None:
+            await self.summary_collection.delete_many({"thread_id": thread_id})
+
+    def _summary_update(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        inserted: Collection[int],
+    ) -> Optional[UpdateOne]:
+        """Upsert of the thread summary for the history writes in `writes`, if any.
+
+        Only root graph writes count; subgraphs write their own messages channel
+        under a non-empty checkpoint_ns, which is not part of the chat. Messages
+        are only counted for the positions in `inserted`, the writes whose upsert
+        created their document, so a retried aput_writes() does not count twice.
+        """
+        if config["configurable"].get("checkpoint_ns", ""):
+            return None
+        messages = [value for channel, value in writes if channel == HISTORY_CHANNEL]
+        if self.summary_collection is None or not messages:
+            return None
+        timestamp = datetime.now(tz=timezone.utc)
+        return UpdateOne(
+            {
+                "thread_id": config["configurable"]["thread_id"],
+                "user_id": config["configurable"]["user_id"],
+            },
+            {
+                "$setOnInsert": {
+                    "title": message_title(messages[0]),
+                    "first_timestamp": timestamp,
+                },
+                "$max": {"last_timestamp": timestamp},
+                "$inc": {
+                    "message_count": sum(
+                        message_count(value)
+                        for index, (channel, value) in enumerate(writes)
+                        if channel == HISTORY_CHANNEL and index in inserted
+                    )
+                },
+            },
+            upsert=True,
+        )
+
+    def _loads_writes(self, writes: list[dict]) -> list[tuple[str, str, Any]]:
+        return [
+            (
+                wrt["task_id"],
+                wrt["channel"],
+                self.serde.loads_typed((wrt["type"], wrt["value"])),
+            )
+            for wrt in writes
+        ]
+
+    def _to_checkpoint_tuple(
+        self, doc: dict, checkpoint: Checkpoint, writes: list[dict]
+    ) -> CheckpointTuple:
+        config_values = {
+            "thread_id": doc["thread_id"],
+            "user_id": doc["user_id"],
+            "checkpoint_ns": doc["checkpoint_ns"],
+            "checkpoint_id": doc["checkpoint_id"],
+        }
+        return CheckpointTuple(
+            config={"configurable": config_values},
+            checkpoint=checkpoint,
+            metadata=loads_metadata(doc["metadata"]),
+            parent_config=(
+                {
+                    "configurable": {
+                        **config_values,
+                        "checkpoint_id": doc["parent_checkpoint_id"],
+                    }
+                }
+                if doc.get("parent_checkpoint_id")
+                else None
+            ),
+            pending_writes=self._loads_writes(writes),
+        )
+
+    async def _fetch_writes(self, docs: list[dict]) -> dict[tuple, list[dict]]:
+        """Fetch the pending writes of a batch of checkpoints in a single query.
+        Checkpoints are grouped by thread so each group becomes one `$in` on
+        checkpoint_id, which the writes index serves directly.
+        """
+        groups: dict[tuple, list[str]] = {}
+        for doc in docs:
+            key = (doc["thread_id"], doc["user_id"], doc["checkpoint_ns"])
+            groups.setdefault(key, []).append(doc["checkpoint_id"])
+        clauses = [
+            {
                 "thread_id": thread_id,
                 "user_id": user_id,
                 "checkpoint_ns": checkpoint_ns,
-                "checkpoint_id": doc["checkpoint_id"],
+                "checkpoint_id": {"$in": checkpoint_ids},
             }
-            checkpoint = self.serde.loads_typed((doc["type"], doc["checkpoint"]))
-            serialized_writes = self.writes_collection.find(config_values)
-            pending_writes = [
-                (
-                    wrt["task_id"],
-                    wrt["channel"],
-                    self.serde.loads_typed((wrt["type"], wrt["value"])),
-                )
-                async for wrt in serialized_writes
-            ]
-            return CheckpointTuple(
-                {"configurable": config_values},
-                checkpoint,
-                loads_metadata(doc["metadata"]),
-                (
-                    {
-                        "configurable": {
-                            "thread_id": thread_id,
-                            "user_id": user_id,
-                            "checkpoint_ns": checkpoint_ns,
-                            "checkpoint_id": doc["parent_checkpoint_id"],
-                        }
-                    }
-                    if doc.get("parent_checkpoint_id")
-                    else None
-                ),
-                pending_writes,
+            for (thread_id, user_id, checkpoint_ns), checkpoint_ids in groups.items()
+        ]
+        writes: dict[tuple, list[dict]] = {}
+        if not clauses:
+            return writes
+        query = clauses[0] if len(clauses) == 1 else {"$or": clauses}
+        async for wrt in self.writes_collection.find(query):
+            writes.setdefault(_doc_key(wrt), []).append(wrt)
+        return writes
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Get a checkpoint tuple from the database asynchronously.
+        The pending writes are read with the same indexed `$in` query as alist()
+        rather than a `$lookup`, so a checkpoint with large writes never has to
+        fit in one 16 MB result document.
+        Args:
+            config (RunnableConfig): The config to use for retrieving the checkpoint.
+        Returns:
+            Optional[CheckpointTuple]: The retrieved checkpoint tuple, or None if no matching checkpoint was found.
+        """
+        if cached := self._cached_tuple(config):
+            return cached
+        await self._setup()
+        await self.aflush()
+        query = {
+            "thread_id": config["configurable"]["thread_id"],
+            "user_id": config["configurable"]["user_id"],
+            "checkpoint_ns": config["configurable"].get("checkpoint_ns", ""),
+        }
+        if checkpoint_id := get_checkpoint_id(config):
+            query["checkpoint_id"] = checkpoint_id
+        cursor = self.checkpoint_collection.find(query).sort("checkpoint_id", -1)
+        async for doc in cursor.limit(1):
+            [checkpoint] = await self._load_checkpoints([doc])
+            pending_writes = (await self._fetch_writes([doc])).get(_doc_key(doc), [])
+            checkpoint_tuple = self._to_checkpoint_tuple(
+                doc, checkpoint, pending_writes
             )
+            if not get_checkpoint_id(config):
+                self._cache_tuple(
+                    checkpoint_tuple,
+                    {
+                        (wrt["task_id"], wrt["idx"]): write
+                        for wrt, write in zip(
+                            pending_writes, checkpoint_tuple.pending_writes
+                        )
+                    },
+                )
+            return checkpoint_tuple
+        return None
 
     async def alist(
         self,
@@ -162,6 +1154,7 @@ class CustomAsyncMongoDBSaver(AsyncMongoDBSaver):
         """List checkpoints from the database asynchronously.
         This method retrieves a list of checkpoint tuples from the MongoDB database based
         on the provided config. The checkpoints are ordered by checkpoint ID in descending order (newest first).
+        Pending writes are fetched once per batch of checkpoints instead of once per checkpoint.
         Args:
             config (Optional[RunnableConfig]): Base configuration for filtering checkpoints.
             filter (Optional[dict[str, Any]]): Additional filtering criteria for metadata.
@@ -171,6 +1164,7 @@ class CustomAsyncMongoDBSaver(AsyncMongoDBSaver):
             AsyncIterator[CheckpointTuple]: An asynchronous iterator of matching checkpoint tuples.
         """
         await self._setup()
+        await self.aflush()
         query = {}
         if config is not None:
             if "thread_id" in config["configurable"]:
@@ -185,48 +1179,30 @@ class CustomAsyncMongoDBSaver(AsyncMongoDBSaver):
         if before is not None:
             query["checkpoint_id"] = {"$lt": before["configurable"]["checkpoint_id"]}
         result = self.checkpoint_collection.find(
-            query, limit=0 if limit is None else limit, sort=[("checkpoint_id", -1)]
+            query,
+            limit=0 if limit is None else limit,
+            sort=[("checkpoint_id", -1)],
+            batch_size=LIST_BATCH_SIZE,
         )
+        batch: list[dict] = []
         async for doc in result:
-            config_values = {
-                "thread_id": doc["thread_id"],
-                "checkpoint_ns": doc["checkpoint_ns"],
-                "checkpoint_id": doc["checkpoint_id"],
-                "user_id": doc["user_id"],
-            }
-            serialized_writes = self.writes_collection.find(config_values)
-            pending_writes = [
-                (
-                    wrt["task_id"],
-                    wrt["channel"],
-                    self.serde.loads_typed((wrt["type"], wrt["value"])),
-                )
-                async for wrt in serialized_writes
-            ]
-            yield CheckpointTuple(
-                config={
-                    "configurable": {
-                        "thread_id": doc["thread_id"],
-                        "checkpoint_ns": doc["checkpoint_ns"],
-                        "checkpoint_id": doc["checkpoint_id"],
-                        "user_id": doc["user_id"],
-                    }
-                },
-                checkpoint=self.serde.loads_typed((doc["type"], doc["checkpoint"])),
-                metadata=loads_metadata(doc["metadata"]),
-                parent_config=(
-                    {
-                        "configurable": {
-                            "thread_id": doc["thread_id"],
-                            "checkpoint_ns": doc["checkpoint_ns"],
-                            "checkpoint_id": doc["parent_checkpoint_id"],
-                            "user_id": doc["user_id"],
-                        }
-                    }
-                    if doc.get("parent_checkpoint_id")
-                    else None
-                ),
-                pending_writes=pending_writes,
+            batch.append(doc)
+            if len(batch) < LIST_BATCH_SIZE:
+                continue
+            async for checkpoint_tuple in self._flush_batch(batch):
+                yield checkpoint_tuple
+            batch = []
+        async for checkpoint_tuple in self._flush_batch(batch):
+            yield checkpoint_tuple
+
+    async def _flush_batch(self, docs: list[dict]) -> AsyncIterator[CheckpointTuple]:
+        if not docs:
+            return
+        writes = await self._fetch_writes(docs)
+        checkpoints = await self._load_checkpoints(docs)
+        for doc, checkpoint in zip(docs, checkpoints):
+            yield self._to_checkpoint_tuple(
+                doc, checkpoint, writes.get(_doc_key(doc), [])
             )
 
     async def aput(
@@ -248,12 +1224,16 @@ class CustomAsyncMongoDBSaver(AsyncMongoDBSaver):
             RunnableConfig: Updated configuration after storing the checkpoint.
         """
         await self._setup()
+        # writes of the previous step must be stored before the next checkpoint
+        await self.aflush()
         thread_id = config["configurable"]["thread_id"]
         checkpoint_ns = config["configurable"]["checkpoint_ns"]
         checkpoint_id = checkpoint["id"]
         user_id = config["configurable"]["user_id"]
         timestamp = datetime.now(tz=timezone.utc)
-        type_, serialized_checkpoint = self.serde.dumps_typed(checkpoint)
+        type_, serialized_checkpoint, delta_fields = self._encode_checkpoint(
+            config, checkpoint
+        )
         doc = {
             "parent_checkpoint_id": config["configurable"].get("checkpoint_id"),
             "type": type_,
@@ -261,18 +1241,45 @@ class CustomAsyncMongoDBSaver(AsyncMongoDBSaver):
             "metadata": dumps_metadata(metadata),
             "timestamp": timestamp,
             "user_id": user_id,
+            **delta_fields,
         }
         upsert_query = {
             "thread_id": thread_id,
             "user_id": user_id,
-            "timestamp": timestamp,
             "checkpoint_ns": checkpoint_ns,
             "checkpoint_id": checkpoint_id,
         }
-        # Perform your operations here
-        await self.checkpoint_collection.update_one(
-            upsert_query, {"$set": doc}, upsert=True
+        collection = (
+            self._subgraph_checkpoints if checkpoint_ns else self._root_checkpoints
         )
+        await collection.update_one(upsert_query, {"$set": doc}, upsert=True)
+        if self.cache_size > 0:
+            # re-saving the same checkpoint id keeps the writes already made on it
+            cached = self._latest.get((thread_id, user_id, checkpoint_ns))
+            writes = (
+                cached[1]
+                if cached and cached[0].checkpoint["id"] == checkpoint_id
+                else {}
+            )
+            parent_checkpoint_id = config["configurable"].get("checkpoint_id")
+            self._cache_tuple(
+                CheckpointTuple(
+                    config={"configurable": upsert_query},
+                    checkpoint=checkpoint,
+                    metadata=loads_metadata(doc["metadata"]),
+                    parent_config=(
+                        {
+                            "configurable": {
+                                **upsert_query,
+                                "checkpoint_id": parent_checkpoint_id,
+                            }
+                        }
+                        if parent_checkpoint_id
+                        else None
+                    ),
+                ),
+                writes,
+            )
         return {
             "configurable": {
                 "thread_id": thread_id,
@@ -313,7 +1320,6 @@ class CustomAsyncMongoDBSaver(AsyncMongoDBSaver):
                 "checkpoint_ns": checkpoint_ns,
                 "checkpoint_id": checkpoint_id,
                 "user_id": user_id,
-                "timestamp": datetime.now(tz=timezone.utc),
                 "task_id": task_id,
                 "task_path": task_path,
                 "idx": WRITES_IDX_MAP.get(channel, idx),
@@ -327,6 +1333,7 @@ class CustomAsyncMongoDBSaver(AsyncMongoDBSaver):
                             "channel": channel,
                             "type": type_,
                             "value": serialized_value,
+                            "display": message_display(value),
                             "user_id": user_id,
                             "timestamp": datetime.now(tz=timezone.utc),
                         }
@@ -334,4 +1341,21 @@ class CustomAsyncMongoDBSaver(AsyncMongoDBSaver):
                     upsert=True,
                 )
             )
-        await self.writes_collection.bulk_write(operations)
+        self._cache_writes(config, writes, task_id, replace=set_method == "$set")
+        if self.write_behind_interval is None:
+            result = await self._durable_writes.bulk_write(operations)
+            summary = self._summary_update(
+                config, writes, _inserted(result, len(operations))
+            )
+            if summary is not None:
+                await self._durable_summaries.bulk_write([summary])
+            self._history_changed(thread_id, user_id)
+            return
+        if self.summary_collection is not None:
+            self._buffered_summaries.append(
+                (len(self._buffered_writes), config, writes)
+            )
+        self._buffered_writes.extend(operations)
+        self._buffered_threads.add((thread_id, user_id))
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
@@ -1,5 +1,9 @@
 from .builder import build_graph
+from .registry import close_graph, get_graph, init_graph
 
 __all__ = [
     "build_graph",
+    "close_graph",
+    "get_graph",
+    "init_graph",
 ]
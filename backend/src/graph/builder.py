@@ -1,13 +1,19 @@
+import asyncio
 import json
 import logging
 from contextlib import asynccontextmanager
 from copy import deepcopy
+from datetime import timedelta
 from typing import AsyncGenerator, Literal
 
-from langchain_core.messages import AIMessage
+from langchain_core.callbacks.manager import adispatch_custom_event
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.errors import GraphBubbleUp
 from langgraph.graph import END, START, StateGraph
 from langgraph.graph.state import CompiledStateGraph
-from langgraph.types import Command
+from langgraph.types import Command, Send
 
 from ..agents import (
     build_calendar_agent,
@@ -17,9 +23,43 @@ from ..agents import (
 )
 from ..agents.llm_model import llm
 from ..agents.search import tavily_tool
-from ..config import MONGO_DB_NAME, MONGO_URI
-from ..db import CustomAsyncMongoDBSaver
+from ..config import (
+    CHECKPOINT_BACKEND,
+    CHECKPOINT_CACHE_SIZE,
+    CHECKPOINT_CREATE_INDEXES,
+    CHECKPOINT_DURABILITY,
+    CHECKPOINT_KEEP_LAST,
+    CHECKPOINT_QUERY_PLAN_CHECK,
+    CHECKPOINT_RETENTION_INTERVAL_SECONDS,
+    CHECKPOINT_SNAPSHOT_INTERVAL,
+    CHECKPOINT_SQLITE_PATH,
+    CHECKPOINT_STORAGE_MODE,
+    CHECKPOINT_THREAD_TTL_DAYS,
+    CHECKPOINT_WRITE_BEHIND_MS,
+    CHECKPOINT_WRITES_DURABILITY,
+    COMPACTION_KEEP_MESSAGES,
+    COMPACTION_TOKEN_THRESHOLD,
+    MONGO_DB_NAME,
+    PARALLEL_PLAN_STEPS,
+    ROUTING_MODE,
+    SPECULATIVE_PLANNING,
+    SUBAGENT_CHECKPOINT_MODE,
+    SUBGRAPH_CHECKPOINT_DURABILITY,
+)
+from ..db import (
+    CustomAsyncMongoDBSaver,
+    LocalCheckpointSaver,
+    get_blob_codec,
+    get_client,
+    history_cache,
+)
+from ..db.local_checkpoint import IN_MEMORY
 from ..prompts.template import apply_prompt_template
+from .compaction import compact_messages, needs_compaction
+from .context import build_agent_context, latest_user_query
+from .digest import digest_entry, format_routing_digest
+from .plan import parse_plan_steps, pending_plan_steps, ready_plan_steps
+from .speculation import SPECULATIVE_PLAN_EVENT, cancel_task, pop_task, start_task
 from .types import Router, State
 
 logger = logging.getLogger(__name__)
@@ -27,101 +67,218 @@ logger = logging.getLogger(__name__)
 RESPONSE_FORMAT = "Response from {}:\n\n<response>\n{}\n</response>\n\n*Please execute the next step.*"
 
 
+def _build_agent_node(name: str, agent: CompiledStateGraph):
+    """Create a graph node that runs a team member agent and reports back to the supervisor."""
+    label = name.replace("_", " ").capitalize()
+
+    async def agent_node(state: State) -> Command[Literal["supervisor", "join"]]:
+        logger.info(f"{label} agent starting task")
+        step = state.get("current_step")
+        goto = "join" if state.get("fan_out") else "supervisor"
+        try:
+            result = await agent.ainvoke(build_agent_context(name, state))
+        except GraphBubbleUp:
+            raise
+        except Exception as e:
+            logger.exception(f"{label} agent failed: {e}")
+            update = {
+                "messages": [
+                    AIMessage(
+                        content=RESPONSE_FORMAT.format(name, f"Error: {e}"),
+                        name=name,
+                    )
+                ]
+            }
+            if step is not None:
+                update["failed_steps"] = [step]
+            update["routing_digest"] = [digest_entry(name, step, "failed", str(e))]
+            return Command(update=update, goto=goto)
+
+        logger.info(f"{label} agent completed task")
+        logger.debug(f"{label} agent response: {result['messages'][-1].content}")
+        update = {
+            "messages": [
+                AIMessage(
+                    content=RESPONSE_FORMAT.format(
+                        name, result["messages"][-1].content
+                    ),
+                    name=name,
+                )
+            ]
+        }
+        if step is not None:
+            update["completed_steps"] = [step]
+        update["routing_digest"] = [
+            digest_entry(name, step, "completed", result["messages"][-1].content)
+        ]
+        return Command(update=update, goto=goto)
+
+    return agent_node
+
+
+async def _search_before_planning(query: str) -> str:
+    """Search the web for the user's request and format the results for the planner."""
+    searched_content = await tavily_tool.ainvoke({"query": query})
+    return json.dumps(
+        [
+            {"title": elem["title"], "content": elem["content"]}
+            for elem in searched_content["results"]
+        ],
+        ensure_ascii=False,
+    )
+
+
+async def _generate_plan(state: State, config: RunnableConfig) -> str:
+    """Run the planner LLM (with optional pre-planning search) and return the raw plan."""
+    messages = apply_prompt_template("planner", state)
+
+    # Add search results if requested
+    if state.get("search_before_planning"):
+        search_results = None
+        task = pop_task(config, "search_before_planning")
+        if task is not None:
+            try:
+                search_results = await task
+            except Exception as e:
+                logger.warning(f"Prefetched search failed, searching again: {e}")
+        if search_results is None:
+            search_results = await _search_before_planning(latest_user_query(state))
+        messages = deepcopy(messages)
+        messages[-1].content += f"\n\n# Relative Search Results\n\n{search_results}"
+
+    # Stream response from LLM
+    stream = llm.astream(messages)
+    full_response = ""
+    async for chunk in stream:
+        full_response += chunk.content
+
+    # Clean up JSON formatting
+    if full_response.startswith("```json"):
+        full_response = full_response.removeprefix("```json")
+
+    if full_response.endswith("```"):
+        full_response = full_response.removesuffix("```")
+    return full_response
+
+
 @asynccontextmanager
-async def build_graph() -> AsyncGenerator[CompiledStateGraph, None]:
-    async with CustomAsyncMongoDBSaver.from_conn_string(
-        MONGO_URI,
+async def _open_checkpointer(
+    backend: str,
+    checkpoint_durability: str,
+    subgraph_durability: str,
+    writes_durability: str,
+) -> AsyncGenerator[BaseCheckpointSaver, None]:
+    """Open the checkpointer for `backend` and run its maintenance tasks."""
+    if backend in ("sqlite", "memory"):
+        path = CHECKPOINT_SQLITE_PATH if backend == "sqlite" else IN_MEMORY
+        async with LocalCheckpointSaver.from_path(
+            path, on_history_change=history_cache.invalidate
+        ) as checkpointer:
+            yield checkpointer
+        return
+
+    async with CustomAsyncMongoDBSaver.from_client(
+        await get_client(),
         db_name=MONGO_DB_NAME,
         checkpoint_collection_name="travel_planner_checkpoint",
         writes_collection_name="travel_planner_history",
+        summary_collection_name="travel_planner_thread_summary",
+        storage_mode=CHECKPOINT_STORAGE_MODE,
+        snapshot_interval=CHECKPOINT_SNAPSHOT_INTERVAL,
+        codec=get_blob_codec(),
+        cache_size=CHECKPOINT_CACHE_SIZE,
+        write_behind_interval=(
+            CHECKPOINT_WRITE_BEHIND_MS / 1000
+            if CHECKPOINT_WRITE_BEHIND_MS > 0
+            else None
+        ),
+        checkpoint_durability=checkpoint_durability,
+        subgraph_durability=subgraph_durability,
+        writes_durability=writes_durability,
+        create_indexes=CHECKPOINT_CREATE_INDEXES,
+        on_history_change=history_cache.invalidate,
     ) as checkpointer:
-
-        calendar_agent = build_calendar_agent(checkpointer)
-        search_agent = build_search_agent(checkpointer)
-        sharing_agent = build_sharing_agent(checkpointer)
-        travel_planner_agent = build_travel_planner_agent(checkpointer)
-
-        async def calendar_node(state: State) -> Command[Literal["supervisor"]]:
-            """Node for the calendar agent that performs calendar management tasks."""
-            logger.info("Calendar agent starting task")
-            result = await calendar_agent.ainvoke(state)
-            logger.info("Calendar agent completed task")
-            logger.debug(f"Calendar agent response: {result['messages'][-1].content}")
-            return Command(
-                update={
-                    "messages": [
-                        AIMessage(
-                            content=RESPONSE_FORMAT.format(
-                                "calendar", result["messages"][-1].content
-                            ),
-                            name="calendar",
-                        )
-                    ]
-                },
-                goto="supervisor",
+        if CHECKPOINT_CREATE_INDEXES:
+            # list threads written before the summary collection existed
+            await checkpointer.abackfill_summaries()
+        if CHECKPOINT_QUERY_PLAN_CHECK:
+            await checkpointer.check_query_plans()
+        retention_task = None
+        if CHECKPOINT_KEEP_LAST > 0 or CHECKPOINT_THREAD_TTL_DAYS > 0:
+            retention_task = asyncio.create_task(
+                checkpointer.run_retention(
+                    keep_last=CHECKPOINT_KEEP_LAST,
+                    thread_ttl=(
+                        timedelta(days=CHECKPOINT_THREAD_TTL_DAYS)
+                        if CHECKPOINT_THREAD_TTL_DAYS > 0
+                        else None
+                    ),
+                    interval=CHECKPOINT_RETENTION_INTERVAL_SECONDS,
+                )
             )
+        try:
+            yield checkpointer
+        finally:
+            if retention_task is not None:
+                retention_task.cancel()
 
-        async def search_node(state: State) -> Command[Literal["supervisor"]]:
-            """Node for the search agent that performs web search tasks."""
-            logger.info("Search agent starting task")
-            result = await search_agent.ainvoke(state)
-            logger.info("Search agent completed task")
-            logger.debug(f"Search agent response: {result['messages'][-1].content}")
-            return Command(
-                update={
-                    "messages": [
-                        AIMessage(
-                            content=RESPONSE_FORMAT.format(
-                                "search", result["messages"][-1].content
-                            ),
-                            name="search",
-                        )
-                    ]
-                },
-                goto="supervisor",
-            )
 
-        async def sharing_node(state: State) -> Command[Literal["supervisor"]]:
-            """Node for the sharing agent that performs content sharing tasks."""
-            logger.info("Sharing agent starting task")
-            result = await sharing_agent.ainvoke(state)
-            logger.info("Sharing agent completed task")
-            logger.debug(f"Sharing agent response: {result['messages'][-1].content}")
-            return Command(
-                update={
-                    "messages": [
-                        AIMessage(
-                            content=RESPONSE_FORMAT.format(
-                                "sharing", result["messages"][-1].content
-                            ),
-                            name="sharing",
-                        )
-                    ]
-                },
-                goto="supervisor",
-            )
+@asynccontextmanager
+async def build_graph(
+    routing_mode: str = ROUTING_MODE,
+    parallel_steps: bool = PARALLEL_PLAN_STEPS,
+    speculative_planning: bool = SPECULATIVE_PLANNING,
+    compaction_threshold: int = COMPACTION_TOKEN_THRESHOLD,
+    subagent_checkpoint_mode: str = SUBAGENT_CHECKPOINT_MODE,
+    checkpoint_durability: str = CHECKPOINT_DURABILITY,
+    subgraph_durability: str = SUBGRAPH_CHECKPOINT_DURABILITY,
+    writes_durability: str = CHECKPOINT_WRITES_DURABILITY,
+    checkpoint_backend: str = CHECKPOINT_BACKEND,
+) -> AsyncGenerator[CompiledStateGraph, None]:
+    """Build the agent workflow graph.
 
-        async def travel_planner_node(state: State) -> Command[Literal["supervisor"]]:
-            """Node for the travel planner agent that performs travel planning tasks."""
-            logger.info("Travel planner agent starting task")
-            result = await travel_planner_agent.ainvoke(state)
-            logger.info("Travel planner agent completed task")
-            logger.debug(
-                f"Travel planner agent response: {result['messages'][-1].content}"
-            )
-            return Command(
-                update={
-                    "messages": [
-                        AIMessage(
-                            content=RESPONSE_FORMAT.format(
-                                "travel_planner", result["messages"][-1].content
-                            ),
-                            name="travel_planner",
-                        )
-                    ]
-                },
-                goto="supervisor",
-            )
+    Args:
+        routing_mode: "llm" asks the supervisor LLM after every step. "plan" walks
+            the planner's steps in order and only asks the LLM when the plan is
+            invalid or a step failed.
+        parallel_steps: In "plan" mode, dispatch every step whose dependencies are
+            done at once and wait for all of them in the join node.
+        speculative_planning: Start the planner while the coordinator is still
+            answering and cancel it if the coordinator does not hand off.
+        compaction_threshold: Approximate token count above which the compactor
+            summarizes old turns before the coordinator runs. 0 disables it.
+        subagent_checkpoint_mode: "shared" persists every internal ReAct step of
+            the sub-agents with the outer checkpointer. "ephemeral" runs them
+            without persistence so only outer graph steps are written.
+        checkpoint_durability: Write concern tier for checkpoints of this graph,
+            including the final state of every turn.
+        subgraph_durability: Write concern tier for checkpoints of the sub-agent
+            graphs when subagent_checkpoint_mode is "shared".
+        writes_durability: Write concern tier for the pending writes of every
+            node, which are only needed to resume a step that was interrupted.
+            The durability tiers only apply to the "mongodb" backend.
+        checkpoint_backend: "mongodb", "sqlite" (a WAL-mode file at
+            CHECKPOINT_SQLITE_PATH) or "memory" (lost on restart).
+    """
+    async with _open_checkpointer(
+        checkpoint_backend,
+        checkpoint_durability=checkpoint_durability,
+        subgraph_durability=subgraph_durability,
+        writes_durability=writes_durability,
+    ) as checkpointer:
+        # False keeps sub-agents from inheriting the outer checkpointer
+        subagent_checkpointer = (
+            False if subagent_checkpoint_mode == "ephemeral" else checkpointer
+        )
+        calendar_agent = build_calendar_agent(subagent_checkpointer)
+        search_agent = build_search_agent(subagent_checkpointer)
+        sharing_agent = build_sharing_agent(subagent_checkpointer)
+        travel_planner_agent = build_travel_planner_agent(subagent_checkpointer)
+
+        calendar_node = _build_agent_node("calendar", calendar_agent)
+        search_node = _build_agent_node("search", search_agent)
+        sharing_node = _build_agent_node("sharing", sharing_agent)
+        travel_planner_node = _build_agent_node("travel_planner", travel_planner_agent)
 
         async def supervisor_node(state: State) -> Command[
             Literal[
@@ -134,57 +291,104 @@ async def build_graph() -> AsyncGenerator[CompiledStateGraph, None]:
         ]:
             """Supervisor node that decides which agent should act next."""
             logger.info("Supervisor evaluating next action")
-            messages = apply_prompt_template("supervisor", state)
+            if (
+                routing_mode == "plan"
+                and state.get("plan_steps")
+                and not state.get("failed_steps")
+            ):
+                pending = pending_plan_steps(state)
+                if not pending:
+                    logger.info("All plan steps completed, workflow completed")
+                    return Command(goto="__end__", update={"next": "__end__"})
+                ready = ready_plan_steps(state) if parallel_steps else []
+                if len(ready) > 1:
+                    agents = [state["plan_steps"][step]["agent_name"] for step in ready]
+                    logger.info(
+                        f"Supervisor dispatching plan steps in parallel: {agents}"
+                    )
+                    return Command(
+                        goto=[
+                            Send(
+                                agent, {**state, "current_step": step, "fan_out": True}
+                            )
+                            for agent, step in zip(agents, ready)
+                        ],
+                        update={"next": ",".join(agents), "current_step": None},
+                    )
+                step = (ready or pending)[0]
+                goto = state["plan_steps"][step]["agent_name"]
+                logger.info(f"Supervisor following plan step {step + 1}: {goto}")
+                return Command(goto=goto, update={"next": goto, "current_step": step})
+
+            # Route on a compact digest instead of the raw message history
+            messages = apply_prompt_template(
+                "supervisor",
+                {
+                    **state,
+                    "messages": [HumanMessage(content=format_routing_digest(state))],
+                },
+            )
             response = await llm.with_structured_output(Router).ainvoke(messages)
             goto = response["next"]
             logger.debug(f"Current state messages: {state['messages']}")
             logger.debug(f"Supervisor response: {response}")
 
+            step = None
             if goto == "FINISH":
                 goto = "__end__"
                 logger.info("Workflow completed")
             else:
+                # Record the work against the agent's first pending plan step
+                step = next(
+                    (
+                        index
+                        for index in pending_plan_steps(state)
+                        if state["plan_steps"][index]["agent_name"] == goto
+                    ),
+                    None,
+                )
                 logger.info(f"Supervisor delegating to: {goto}")
+                if step is not None:
+                    logger.info(f"Recording {goto} as plan step {step + 1}")
 
-            return Command(goto=goto, update={"next": goto})
+            return Command(goto=goto, update={"next": goto, "current_step": step})
+
+        async def join_node(state: State) -> Command[Literal["supervisor"]]:
+            """Join node that waits for every parallel plan step before the supervisor decides."""
+            logger.info(
+                f"Parallel plan steps joined (completed: {state.get('completed_steps')}, "
+                f"failed: {state.get('failed_steps')})"
+            )
+            return Command(goto="supervisor")
 
         async def planner_node(
-            state: State,
+            state: State, config: RunnableConfig
         ) -> Command[Literal["supervisor", "__end__"]]:
             """Planner node that generate the full plan."""
             logger.info("Planner generating full plan")
-            messages = apply_prompt_template("planner", state)
-
-            # Add search results if requested
-            if state.get("search_before_planning"):
-                searched_content = await tavily_tool.ainvoke(
-                    {"query": state["messages"][-1].content}
-                )
-                messages = deepcopy(messages)
-                messages[
-                    -1
-                ].content += f"\n\n# Relative Search Results\n\n{json.dumps([{'title': elem['title'], 'content': elem['content']} for elem in searched_content["results"]], ensure_ascii=False)}"
-
-            # Stream response from LLM
-            stream = llm.astream(messages)
-            full_response = ""
-            async for chunk in stream:
-                full_response += chunk.content
+            full_response = None
+            task = pop_task(config, "planner")
+            if task is not None:
+                try:
+                    full_response = await task
+                    logger.info("Planner using speculative plan")
+                    await adispatch_custom_event(
+                        SPECULATIVE_PLAN_EVENT,
+                        {"content": full_response},
+                        config=config,
+                    )
+                except Exception as e:
+                    logger.warning(f"Speculative planning failed, planning again: {e}")
+                    full_response = None
+            if full_response is None:
+                full_response = await _generate_plan(state, config)
             logger.debug(f"Current state messages: {state['messages']}")
             logger.debug(f"Planner response: {full_response}")
 
-            # Clean up JSON formatting
-            if full_response.startswith("```json"):
-                full_response = full_response.removeprefix("```json")
-
-            if full_response.endswith("```"):
-                full_response = full_response.removesuffix("```")
-
             goto = "supervisor"
-            try:
-                json.loads(full_response)
-            except json.JSONDecodeError:
-                logger.warning("Planner response is not a valid JSON")
+            plan_steps = parse_plan_steps(full_response)
+            if plan_steps is None:
+                logger.warning("Planner response is not a valid plan")
                 # Continue to supervisor instead of ending
                 # goto = "__end__"
 
@@ -192,15 +396,30 @@ async def build_graph() -> AsyncGenerator[CompiledStateGraph, None]:
                 update={
                     "messages": [AIMessage(content=full_response, name="planner")],
                     "full_plan": full_response,
+                    "plan_steps": plan_steps,
+                    "current_step": None,
+                    "completed_steps": None,
+                    "failed_steps": None,
+                    "routing_digest": None,
                 },
                 goto=goto,
             )
 
         async def coordinator_node(
-            state: State,
+            state: State, config: RunnableConfig
         ) -> Command[Literal["planner", "__end__"]]:
             """Coordinator node that communicate with customers."""
             logger.info("Coordinator talking.")
+            if state.get("search_before_planning"):
+                # Overlap the planner's web search with the coordinator's LLM call
+                start_task(
+                    config,
+                    "search_before_planning",
+                    _search_before_planning(latest_user_query(state)),
+                )
+            if speculative_planning:
+                # Most requests hand off, so start planning before the coordinator decides
+                start_task(config, "planner", _generate_plan(state, config))
             messages = apply_prompt_template("coordinator", state)
             response = await llm.ainvoke(messages)
             logger.debug(f"Current state messages: {state['messages']}")
@@ -213,6 +432,9 @@ async def build_graph() -> AsyncGenerator[CompiledStateGraph, None]:
             ):
                 goto = "planner"
                 logger.info("Coordinator handing off to planner")
+            else:
+                cancel_task(config, "search_before_planning")
+                cancel_task(config, "planner")
 
             # 항상 coordinator의 응답을 상태에 저장하여 checkpoint에 기록되도록 함
             return Command(
@@ -227,9 +449,21 @@ async def build_graph() -> AsyncGenerator[CompiledStateGraph, None]:
                 goto=goto,
             )
 
+        async def compactor_node(state: State) -> Command[Literal["coordinator"]]:
+            """Compactor node that replaces old turns with a summary."""
+            logger.info("Compactor summarizing old messages")
+            update = await compact_messages(state, COMPACTION_KEEP_MESSAGES)
+            return Command(update={"messages": update}, goto="coordinator")
+
+        def route_start(state: State) -> Literal["compactor", "coordinator"]:
+            if needs_compaction(state["messages"], compaction_threshold):
+                return "compactor"
+            return "coordinator"
+
         """Build and return the agent workflow graph."""
         builder = StateGraph(State)
-        builder.add_edge(START, "coordinator")
+        builder.add_conditional_edges(START, route_start)
+        builder.add_node("compactor", compactor_node)
         builder.add_node("coordinator", coordinator_node)
         builder.add_node("planner", planner_node)
         builder.add_node("supervisor", supervisor_node)
@@ -237,5 +471,6 @@ async def build_graph() -> AsyncGenerator[CompiledStateGraph, None]:
         builder.add_node("search", search_node)
         builder.add_node("sharing", sharing_node)
         builder.add_node("travel_planner", travel_planner_node)
+        builder.add_node("join", join_node)
         graph = builder.compile(checkpointer=checkpointer)
         yield graph
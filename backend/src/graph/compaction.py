@@ -0,0 +1,62 @@
+import logging
+from typing import List
+
+from langchain_core.messages import BaseMessage, RemoveMessage, SystemMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+
+from ..agents.llm_model import llm
+from ..prompts.template import apply_prompt_template
+from .types import State
+
+logger = logging.getLogger(__name__)
+
+# 압축 요약 메시지의 name. 히스토리 조회 시 이 메시지는 표시하지 않습니다.
+SUMMARY_MESSAGE_NAME = "summary"
+
+
+def needs_compaction(messages: List[BaseMessage], token_threshold: int) -> bool:
+    """대화 기록의 근사 토큰 수가 임계값을 넘었는지 확인합니다."""
+    if token_threshold <= 0:
+        return False
+    return count_tokens_approximately(messages) > token_threshold
+
+
+def _split_index(messages: List[BaseMessage], keep_messages: int) -> int:
+    """최근 메시지가 사용자 메시지부터 시작하도록 요약 경계를 정합니다."""
+    index = max(len(messages) - keep_messages, 1)
+    while index < len(messages) - 1 and messages[index].type != "human":
+        index += 1
+    return index
+
+
+async def compact_messages(state: State, keep_messages: int) -> List[BaseMessage]:
+    """오래된 메시지를 요약 하나로 바꾸는 messages 채널 업데이트를 만듭니다.
+
+    Args:
+        state (State): 현재 그래프 상태
+        keep_messages (int): 원문 그대로 남길 최근 메시지 수
+
+    Returns:
+        List[BaseMessage]: 전체 삭제 후 [요약, 최근 메시지...]로 다시 채우는 업데이트.
+            요약할 메시지가 없으면 빈 목록
+    """
+    messages = state["messages"]
+    split = _split_index(messages, keep_messages)
+    old_messages, recent_messages = messages[:split], messages[split:]
+    if all(message.name == SUMMARY_MESSAGE_NAME for message in old_messages):
+        # 이미 요약된 상태라면 다시 요약하지 않음
+        return []
+
+    response = await llm.ainvoke(
+        apply_prompt_template("compactor", {**state, "messages": old_messages})
+    )
+    logger.info(
+        f"Compacted {len(old_messages)} messages "
+        f"({count_tokens_approximately(old_messages)} tokens) into a summary"
+    )
+    summary = SystemMessage(
+        content=f"# 이전 대화 요약\n\n{response.content}",
+        name=SUMMARY_MESSAGE_NAME,
+    )
+    return [RemoveMessage(id=REMOVE_ALL_MESSAGES), summary, *recent_messages]
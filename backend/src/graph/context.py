@@ -0,0 +1,113 @@
+import logging
+from typing import Any, Dict, List
+
+from langchain_core.messages import BaseMessage, HumanMessage
+
+from .compaction import SUMMARY_MESSAGE_NAME
+from .types import State
+
+logger = logging.getLogger(__name__)
+
+# 각 에이전트가 작업에 참고하는 다른 에이전트의 결과
+RELEVANT_RESULTS = {
+    "search": [],
+    "calendar": ["travel_planner"],
+    "travel_planner": ["search", "calendar"],
+    "sharing": ["travel_planner"],
+}
+
+TASK_FORMAT = "# 현재 작업\n\n## {title}\n\n{description}"
+
+
+def _turn_start(messages: List[BaseMessage]) -> int:
+    for index in range(len(messages) - 1, -1, -1):
+        if messages[index].type == "human":
+            return index
+    return 0
+
+
+def current_turn(messages: List[BaseMessage]) -> List[BaseMessage]:
+    """마지막 사용자 메시지부터 시작하는 현재 턴의 메시지를 반환합니다."""
+    return messages[_turn_start(messages) :]
+
+
+def _earlier_context(agent_name: str, messages: List[BaseMessage]) -> List[BaseMessage]:
+    """현재 턴 이전에서 에이전트가 참고할 메시지를 고릅니다.
+
+    압축 요약 메시지와, 이번 턴에 결과가 없는 관련 에이전트의 가장 최근 결과를
+    시간순으로 반환합니다. "그 일정 공유해줘" 같은 후속 요청이 이전 턴의
+    결과를 볼 수 있게 합니다.
+    """
+    start = _turn_start(messages)
+    in_turn = {message.name for message in messages[start:] if message.type == "ai"}
+    missing = set(RELEVANT_RESULTS.get(agent_name, [])) - in_turn
+    picked = []
+    for message in reversed(messages[:start]):
+        if message.type == "ai" and message.name in missing:
+            missing.discard(message.name)
+            picked.append(message)
+    picked.reverse()
+    summary = [
+        message
+        for message in messages[:start]
+        if message.type == "system" and message.name == SUMMARY_MESSAGE_NAME
+    ]
+    return [*summary, *picked]
+
+
+def latest_user_query(state: State) -> str:
+    """가장 최근 사용자 메시지의 텍스트를 반환합니다."""
+    message = current_turn(state["messages"])[0]
+    if isinstance(message.content, str):
+        return message.content
+    return " ".join(
+        item.get("text", "")
+        for item in message.content
+        if isinstance(item, dict) and item.get("type") == "text"
+    )
+
+
+def build_agent_context(agent_name: str, state: State) -> Dict[str, Any]:
+    """에이전트에 전달할 입력 상태를 만듭니다.
+
+    계획 단계가 있으면 사용자 요청, 현재 단계의 작업 지시, 관련 에이전트의
+    이번 턴 결과만 전달합니다. 계획 단계가 없으면 현재 턴의 메시지 전체를
+    전달합니다. 두 경우 모두 압축 요약과, 이번 턴에 결과가 없는 관련
+    에이전트의 이전 턴 결과를 앞에 붙입니다.
+
+    Args:
+        agent_name (str): 실행할 에이전트 이름
+        state (State): 현재 그래프 상태
+
+    Returns:
+        Dict[str, Any]: messages가 축소된 상태
+    """
+    turn = current_turn(state["messages"])
+    earlier = _earlier_context(agent_name, state["messages"])
+    step = state.get("current_step")
+    plan_steps = state.get("plan_steps") or []
+    if step is None or step >= len(plan_steps):
+        return {**state, "messages": [*earlier, *turn]}
+
+    plan_step = plan_steps[step]
+    task = TASK_FORMAT.format(
+        title=plan_step.get("title", ""),
+        description=plan_step.get("description", ""),
+    )
+    if plan_step.get("note"):
+        task += f"\n\n{plan_step['note']}"
+
+    relevant = RELEVANT_RESULTS.get(agent_name, [])
+    results = [
+        message
+        for message in turn[1:]
+        if message.type == "ai" and message.name in relevant
+    ]
+    logger.debug(
+        f"{agent_name} context: step {step + 1}, {len(results)} results this turn, "
+        f"{len(earlier)} earlier messages"
+    )
+    return {
+        **state,
+        "messages": [*earlier, turn[0], *results, HumanMessage(content=task)],
+    }
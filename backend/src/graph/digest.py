@@ -0,0 +1,76 @@
+import re
+from typing import Any, Dict, Optional
+
+from .context import latest_user_query
+from .plan import pending_plan_steps
+from .types import State
+
+# 라우팅 요약에 남길 에이전트 결과, 사용자 요청, 계획 단계 설명의 최대 길이
+SUMMARY_MAX_CHARS = 300
+REQUEST_MAX_CHARS = 1000
+STEP_MAX_CHARS = 300
+
+
+def _shorten(text: str, max_chars: int) -> str:
+    text = re.sub(r"\s+", " ", text).strip()
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars] + "..."
+
+
+def digest_entry(
+    agent_name: str, step: Optional[int], status: str, content: Any
+) -> Dict[str, Any]:
+    """에이전트 실행 결과 하나를 라우팅 요약 항목으로 만듭니다.
+
+    Args:
+        agent_name (str): 실행한 에이전트 이름
+        step (Optional[int]): 실행한 계획 단계 번호. 계획 없이 실행했으면 None
+        status (str): "completed" 또는 "failed"
+        content (Any): 에이전트의 최종 응답 또는 오류 메시지
+
+    Returns:
+        Dict[str, Any]: routing_digest에 추가할 항목
+    """
+    return {
+        "agent": agent_name,
+        "step": step,
+        "status": status,
+        "summary": _shorten(str(content), SUMMARY_MAX_CHARS),
+    }
+
+
+def format_routing_digest(state: State) -> str:
+    """supervisor가 다음 작업자를 고를 때 읽을 고정 크기의 작업 현황을 만듭니다."""
+    lines = [
+        "# 사용자 요청",
+        _shorten(latest_user_query(state), REQUEST_MAX_CHARS),
+        "",
+        "# 계획 단계",
+    ]
+    plan_steps = state.get("plan_steps") or []
+    pending = set(pending_plan_steps(state))
+    failed = set(state.get("failed_steps") or [])
+    for index, step in enumerate(plan_steps):
+        if index not in pending:
+            status = "완료"
+        elif index in failed:
+            status = "실패"
+        else:
+            status = "대기"
+        lines.append(
+            f"{index + 1}. [{status}] {step.get('agent_name')} - {step.get('title', '')}"
+        )
+        if step.get("description"):
+            lines.append(f"   {_shorten(step['description'], STEP_MAX_CHARS)}")
+    if not plan_steps:
+        lines.append("유효한 계획 없음")
+
+    lines += ["", "# 실행된 작업"]
+    for entry in state.get("routing_digest") or []:
+        step = "" if entry["step"] is None else f" (단계 {entry['step'] + 1})"
+        status = "완료" if entry["status"] == "completed" else "실패"
+        lines.append(f"- {entry['agent']}{step} [{status}]: {entry['summary']}")
+    if not state.get("routing_digest"):
+        lines.append("아직 실행된 작업 없음")
+    return "\n".join(lines)
@@ -0,0 +1,70 @@
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from ..config import TEAM_MEMBERS
+from .types import State
+
+logger = logging.getLogger(__name__)
+
+
+def parse_plan_steps(full_plan: Optional[str]) -> Optional[List[Dict[str, Any]]]:
+    """planner의 JSON 계획에서 실행할 단계 목록을 추출합니다.
+
+    Args:
+        full_plan (Optional[str]): planner가 생성한 원시 JSON 문자열
+
+    Returns:
+        Optional[List[Dict[str, Any]]]: 단계 목록. 계획이 유효하지 않으면 None
+    """
+    if not full_plan:
+        return None
+    try:
+        plan = json.loads(full_plan)
+    except json.JSONDecodeError:
+        return None
+
+    steps = plan.get("steps") if isinstance(plan, dict) else None
+    if not isinstance(steps, list) or not steps:
+        return None
+
+    for step in steps:
+        if not isinstance(step, dict) or step.get("agent_name") not in TEAM_MEMBERS:
+            logger.warning(f"Plan step has unknown agent: {step}")
+            return None
+    return steps
+
+
+def pending_plan_steps(state: State) -> List[int]:
+    """아직 완료되지 않은 계획 단계 번호를 순서대로 반환합니다."""
+    completed = set(state.get("completed_steps") or [])
+    return [
+        index
+        for index in range(len(state.get("plan_steps") or []))
+        if index not in completed
+    ]
+
+
+def step_dependencies(steps: List[Dict[str, Any]], index: int) -> List[int]:
+    """단계가 기다려야 하는 선행 단계 번호를 반환합니다.
+
+    `depends_on`이 없거나 잘못된 경우 이전 단계 전체에 의존하는 것으로 간주하여
+    기존처럼 순차 실행됩니다.
+    """
+    depends_on = steps[index].get("depends_on")
+    if not isinstance(depends_on, list) or not all(
+        isinstance(dep, int) and 0 <= dep < index for dep in depends_on
+    ):
+        return list(range(index))
+    return depends_on
+
+
+def ready_plan_steps(state: State) -> List[int]:
+    """선행 단계가 모두 완료되어 지금 바로 실행할 수 있는 단계 번호를 반환합니다."""
+    steps = state.get("plan_steps") or []
+    completed = set(state.get("completed_steps") or [])
+    return [
+        index
+        for index in pending_plan_steps(state)
+        if completed.issuperset(step_dependencies(steps, index))
+    ]
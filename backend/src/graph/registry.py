@@ -0,0 +1,53 @@
+import asyncio
+import logging
+from contextlib import AsyncExitStack
+from typing import Optional
+
+from langgraph.graph.state import CompiledStateGraph
+
+from .builder import build_graph
+
+logger = logging.getLogger(__name__)
+
+_exit_stack: Optional[AsyncExitStack] = None
+_graph: Optional[CompiledStateGraph] = None
+_lock = asyncio.Lock()
+
+
+async def init_graph() -> CompiledStateGraph:
+    """프로세스 전역 그래프와 체크포인터를 한 번만 생성합니다."""
+    global _exit_stack, _graph
+    async with _lock:
+        if _graph is not None:
+            return _graph
+        exit_stack = AsyncExitStack()
+        try:
+            _graph = await exit_stack.enter_async_context(build_graph())
+        except Exception as e:
+            await exit_stack.aclose()
+            logger.exception(f"Could not build agent graph: {e}")
+            raise
+        _exit_stack = exit_stack
+        logger.info("Agent graph compiled.")
+        return _graph
+
+
+async def get_graph() -> CompiledStateGraph:
+    """공유 그래프를 반환합니다. 초기화 전이면 먼저 생성합니다."""
+    if _graph is None:
+        return await init_graph()
+    return _graph
+
+
+async def close_graph():
+    """공유 그래프를 해제하고 체크포인터 연결을 닫습니다."""
+    global _exit_stack, _graph
+    async with _lock:
+        if _exit_stack is None:
+            logger.warning("Graph is None, nothing to close.")
+            return
+        exit_stack = _exit_stack
+        _exit_stack = None
+        _graph = None
+        await exit_stack.aclose()
+        logger.info("Agent graph closed.")
@@ -0,0 +1,65 @@
+import asyncio
+import contextvars
+import logging
+from typing import Coroutine, Dict, Optional
+
+from langchain_core.runnables import RunnableConfig
+
+logger = logging.getLogger(__name__)
+
+# planner_node가 미리 만들어진 계획을 스트리밍할 때 사용하는 커스텀 이벤트 이름
+SPECULATIVE_PLAN_EVENT = "speculative_plan"
+
+# run_agent_workflow가 실행마다 만드는 작업 레지스트리의 configurable 키
+TASKS_CONFIG_KEY = "speculative_tasks"
+
+
+def new_task_registry() -> Dict[str, asyncio.Task]:
+    """실행 하나에 묶인 빈 작업 레지스트리를 만듭니다."""
+    return {}
+
+
+def _registry(config: RunnableConfig) -> Optional[Dict[str, asyncio.Task]]:
+    return config.get("configurable", {}).get(TASKS_CONFIG_KEY)
+
+
+def start_task(
+    config: RunnableConfig, name: str, coro: Coroutine
+) -> Optional[asyncio.Task]:
+    """실행의 작업 레지스트리에 묶인 백그라운드 작업을 시작합니다.
+
+    같은 스레드의 다른 실행과 작업을 공유하지 않도록 레지스트리는 실행마다
+    따로 만들어 config로 전달합니다. 레지스트리가 없으면 작업을 시작하지 않고
+    None을 반환합니다. 작업은 빈 컨텍스트에서 실행되므로 현재 노드의
+    콜백(스트리밍 이벤트)에 섞이지 않습니다.
+    """
+    tasks = _registry(config)
+    if tasks is None:
+        coro.close()
+        return None
+    cancel_task(config, name)
+    task = asyncio.create_task(coro, context=contextvars.Context())
+    tasks[name] = task
+    return task
+
+
+def pop_task(config: RunnableConfig, name: str) -> Optional[asyncio.Task]:
+    """시작된 작업을 레지스트리에서 꺼냅니다. 없으면 None을 반환합니다."""
+    tasks = _registry(config)
+    if tasks is None:
+        return None
+    return tasks.pop(name, None)
+
+
+def cancel_task(config: RunnableConfig, name: str) -> None:
+    """작업이 아직 실행 중이면 취소하고 레지스트리에서 제거합니다."""
+    task = pop_task(config, name)
+    if task is not None and not task.done():
+        task.cancel()
+        logger.info(f"Cancelled speculative task: {name}")
+
+
+def cancel_tasks(config: RunnableConfig) -> None:
+    """실행에 묶인 모든 작업을 취소합니다. 워크플로우 종료 시 호출합니다."""
+    for name in list(_registry(config) or ()):
+        cancel_task(config, name)
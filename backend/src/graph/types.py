@@ -8,6 +8,13 @@ from typing_extensions import TypedDict
 TEAM_MEMBERS = ["calendar", "search", "sharing", "travel_planner"]
 
 
+def extend_or_reset(left: Optional[List[Any]], right: Optional[List[Any]]) -> List[Any]:
+    """목록을 누적합니다. None이 들어오면 새 계획을 위해 비웁니다."""
+    if right is None:
+        return []
+    return [*(left or []), *right]
+
+
 class Router(TypedDict):
     """Worker to route to next. If no workers needed, route to FINISH."""
 
@@ -49,6 +56,16 @@ class TravelPlannerState(TypedDict):
     full_plan: Optional[str]
     execution_status: ExecutionStatus
 
+    # 계획 기반 라우팅 - planner가 만든 단계와 진행 상황
+    plan_steps: Optional[List[Dict[str, Any]]]
+    current_step: Optional[int]
+    fan_out: Optional[bool]  # Send로 병렬 실행된 단계인지 여부 (채널에 기록하지 않음)
+    completed_steps: Annotated[List[int], extend_or_reset]
+    failed_steps: Annotated[List[int], extend_or_reset]
+
+    # supervisor 라우팅용 요약 - 에이전트별 실행 결과 요약 목록
+    routing_digest: Annotated[List[Dict[str, Any]], extend_or_reset]
+
     # 메타데이터 - 구조화된 메타데이터
     metadata: WorkflowMetadata
 
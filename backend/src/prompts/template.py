@@ -23,6 +23,7 @@ def get_prompt_template(prompt_name: str) -> str:
     # 보안: 허용된 프롬프트 파일명만 처리
     allowed_prompts = {
         "calendar",
+        "compactor",
         "coordinator",
         "planner",
         "search",
@@ -1,27 +1,30 @@
-import re
+import base64
+import hashlib
+import json
+from datetime import datetime
 from typing import Any, Dict, List, Optional, Tuple
 
 import msgpack
 
-from ..db import get_db
+from ..db import (
+    LocalCheckpointSaver,
+    get_blob_codec,
+    get_blob_serde,
+    get_db,
+    history_cache,
+    message_display,
+)
+from ..graph import get_graph
 
 _collection_travel_planner_history = "travel_planner_history"
+_collection_travel_planner_thread_summary = "travel_planner_thread_summary"
 
 
-def extract_response_content(text: str) -> str:
-    """Response 태그 안의 내용만 추출합니다."""
-    if not isinstance(text, str):
-        return text
-
-    # <response> 태그 안의 내용을 추출
-    pattern = r"<response>\s*(.*?)\s*</response>"
-    match = re.search(pattern, text, re.DOTALL)
-
-    if match:
-        return match.group(1).strip()
-
-    # <response> 태그가 없으면 원본 텍스트 반환
-    return text
+def decode_value(item: Dict[str, Any]) -> bytes:
+    """압축되어 저장된 value(type이 "zstd+msgpack" 등)를 원래 바이트로 되돌립니다."""
+    if not item.get("value") or not item.get("type"):
+        return item.get("value")
+    return get_blob_codec().decode(item["type"], item["value"])[1]
 
 
 def unpack_ext_type_title(binary_value: bytes) -> Optional[List[str | dict]]:
@@ -45,163 +48,278 @@ def unpack_ext_type_title(binary_value: bytes) -> Optional[List[str | dict]]:
     return None
 
 
-def unpack_ext_type(binary_value: bytes) -> Optional[List[str | dict]]:
-    """Agent 응답 MongoDB 저장된 binarybase64 -> obj 로 변환
-
-    Args:
-        binary_value (bytes): MongoDB - Binary.createFromBase64
-
-    Returns:
-        [str, dict] : [HumanMessage, {tool_name: tool_call_id, args: {}...}]
-    """
-    if not binary_value:
-        return None
-    value_unpacked = msgpack.unpackb(binary_value)
-    if not isinstance(value_unpacked, list) or len(value_unpacked) == 0:
-        return None
+async def _local_saver() -> Optional[LocalCheckpointSaver]:
+    """그래프가 로컬 체크포인트 저장소(sqlite, memory)로 컴파일됐으면 그 저장소를 반환합니다."""
+    checkpointer = (await get_graph()).checkpointer
+    if isinstance(checkpointer, LocalCheckpointSaver):
+        return checkpointer
+    return None
 
-    item = value_unpacked[-1]
 
-    if not isinstance(item, msgpack.ExtType):
-        return None
+def encode_cursor(timestamp: datetime, thread_id: str) -> str:
+    """목록의 마지막 스레드(timestamp, thread_id)를 불투명한 커서 문자열로 만듭니다."""
+    payload = json.dumps([timestamp.isoformat(), thread_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode()
 
-    ext_unpacked = msgpack.unpackb(item.data)
-    if not isinstance(ext_unpacked, list) or len(ext_unpacked) < 2:
-        return None
 
-    return ext_unpacked[1:3]
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """encode_cursor로 만든 커서를 (timestamp, thread_id)로 되돌립니다.
 
-
-async def get_grouped_all_history_by_user_id(
-    user_id: str, page: int, page_size: int
+    Raises:
+        ValueError: 올바른 커서가 아닌 경우
+    """
+    try:
+        timestamp, thread_id = json.loads(base64.urlsafe_b64decode(cursor))
+        return datetime.fromisoformat(timestamp), str(thread_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+async def _find_thread_summaries(
+    user_id: str,
+    page: int,
+    page_size: int,
+    after: Optional[Tuple[datetime, str]] = None,
 ) -> Tuple[int, List[Dict[str, Any]]]:
-    """user_id로 그룹화된 채팅 내역을 가져옵니다."""
-    client = await get_db()
+    """스레드 요약(thread_id, title, timestamp) 목록과 전체 스레드 수를 가져옵니다.
 
-    pipeline = [
-        {"$match": {"user_id": user_id, "channel": "messages"}},
-        {"$sort": {"timestamp": 1}},
-        {
-            "$group": {
-                "_id": "$thread_id",
-                "first_message": {"$first": "$$ROOT"},
-                "last_message": {"$last": "$$ROOT"},
+    MongoDB에서는 체크포인터가 쓰기 시점에 갱신하는 스레드 요약 컬렉션을
+    (user_id, first_timestamp, thread_id) 인덱스로 조회합니다. `after`가 있으면
+    그 스레드 다음부터 가져오므로(keyset) 페이지 깊이와 무관하게 비용이 같습니다.
+    """
+    if saver := await _local_saver():
+        total_threads, result = await saver.ahistory_threads(
+            user_id,
+            page,
+            page_size,
+            (after[0].isoformat(), after[1]) if after else None,
+        )
+        return total_threads, [
+            {
+                "thread_id": doc["thread_id"],
+                "title": unpack_ext_type_title(decode_value(doc)),
+                "timestamp": doc["timestamp"],
             }
-        },
-        {"$sort": {"first_message.timestamp": -1}},
-        {"$skip": (page - 1) * page_size},
-        {"$limit": page_size},
-        {"$replaceRoot": {"newRoot": "$first_message"}},
+            for doc in result
+        ]
+    client = await get_db()
+    collection = client[_collection_travel_planner_thread_summary]
+
+    query: Dict[str, Any] = {"user_id": user_id}
+    if after:
+        timestamp, thread_id = after
+        query["$or"] = [
+            {"first_timestamp": {"$lt": timestamp}},
+            {"first_timestamp": timestamp, "thread_id": {"$lt": thread_id}},
+        ]
+    cursor = collection.find(
+        query, {"_id": 0, "thread_id": 1, "title": 1, "first_timestamp": 1}
+    ).sort([("first_timestamp", -1), ("thread_id", -1)])
+    if not after:
+        cursor = cursor.skip((page - 1) * page_size)
+    result = await cursor.limit(page_size).to_list(length=None)
+    total_threads = await collection.count_documents({"user_id": user_id})
+    return total_threads, [
+        {
+            "thread_id": doc["thread_id"],
+            "title": doc.get("title"),
+            "timestamp": doc["first_timestamp"],
+        }
+        for doc in result
     ]
 
-    # 전체 그룹 수 계산을 위한 파이프라인
-    count_pipeline = [
-        {"$match": {"user_id": user_id, "channel": "messages"}},
-        {"$group": {"_id": "$thread_id"}},
-        {"$count": "total"},
-    ]
-    # 쿼리 실행
-    result = (
-        await client[_collection_travel_planner_history]
-        .aggregate(pipeline)
-        .to_list(length=None)
-    )
-    count_result = (
-        await client[_collection_travel_planner_history]
-        .aggregate(count_pipeline)
-        .to_list(length=None)
-    )
 
-    total_threads = count_result[0]["total"] if count_result else 0
+async def get_grouped_all_history_by_user_id(
+    user_id: str, page: int, page_size: int, cursor: Optional[str] = None
+) -> Tuple[int, List[Dict[str, Any]], Optional[str]]:
+    """user_id로 그룹화된 채팅 내역과 다음 페이지 커서를 가져옵니다.
+
+    cursor가 있으면 page 대신 커서 다음부터 가져옵니다. 마지막 페이지이면
+    다음 페이지 커서는 None입니다.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    total_threads, result = await _find_thread_summaries(
+        user_id, page, page_size, after
+    )
+    next_cursor = None
+    if len(result) == page_size:
+        last = result[-1]
+        next_cursor = encode_cursor(last["timestamp"], last["thread_id"])
 
     # 결과 변환
     formatted_result = []
-    for group in result:
-        # 최신 메시지를 기준으로 데이터 구성
-        unpack_value = unpack_ext_type_title(group["value"])
-        if not unpack_value:
+    for summary in result:
+        # 첫 메시지 내용을 스레드 제목으로 사용
+        if not summary["title"]:
             continue
 
         item = {
-            "id": group["thread_id"],
-            "thread_id": group["thread_id"],
-            "message": unpack_value,
-            "timestamp": group["timestamp"],
+            "id": summary["thread_id"],
+            "thread_id": summary["thread_id"],
+            "message": summary["title"],
+            "timestamp": summary["timestamp"],
             "user_id": user_id,
         }
         formatted_result.append(item)
 
-    return total_threads, formatted_result
+    return total_threads, formatted_result, next_cursor
+
+
+async def _last_write_timestamp(user_id: str, thread_id: str) -> Optional[datetime]:
+    """스레드의 마지막 쓰기 시각을 (thread_id, user_id, timestamp) 인덱스로 가져옵니다.
+
+    사용자의 스레드가 아니면 None을 반환하므로 소유 확인도 겸합니다.
+    """
+    if saver := await _local_saver():
+        return await saver.ahistory_last_timestamp(user_id, thread_id)
+    client = await get_db()
+    doc = await client[_collection_travel_planner_history].find_one(
+        {"thread_id": thread_id, "user_id": user_id},
+        {"_id": 0, "timestamp": 1},
+        sort=[("timestamp", -1)],
+    )
+    return doc["timestamp"] if doc else None
+
+
+def history_etag(user_id: str, thread_id: str, last_write: datetime) -> str:
+    """스레드의 마지막 쓰기 시각으로 대화 내역의 ETag를 만듭니다."""
+    version = f"{user_id}:{thread_id}:{last_write.isoformat()}"
+    return f'"{hashlib.sha1(version.encode()).hexdigest()}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+def _display_message(display: Dict[str, Any]) -> Any:
+    """쓰기 시점에 저장된 display 필드를 응답 message 형태로 바꿉니다.
+
+    kind가 "text"이면 사용자 입력 문자열, "message"이면 [role, {content, name,
+    tool_calls}]를 반환합니다.
+    """
+    if display["kind"] == "text":
+        return display["text"]
+    return [
+        display["role"],
+        {
+            "content": display["text"],
+            "name": display.get("name"),
+            "tool_calls": display.get("tool_calls", []),
+        },
+    ]
+
+
+def _legacy_message(item: Dict[str, Any]) -> Any:
+    """display 필드가 없는 이전 문서는 blob을 풀어 같은 display 형태로 만듭니다."""
+    if not item.get("value") or not item.get("type"):
+        return None
+    display = message_display(
+        get_blob_serde().loads_typed((item["type"], item["value"]))
+    )
+    return _display_message(display) if display else None
 
 
-async def get_thread_ids_by_user_id(user_id: str) -> List[str]:
-    """user_id로 채팅 아이디를 가져옵니다."""
+async def _find_thread_writes(user_id: str, thread_id: str) -> List[Dict[str, Any]]:
+    """스레드의 쓰기 문서를 시간순으로 가져옵니다.
+
+    display 필드가 있는 문서는 blob 없이 가져오고, display가 없는 이전 문서만
+    type/value를 한 번 더 조회합니다.
+    """
+    if saver := await _local_saver():
+        return await saver.ahistory_writes(user_id, thread_id)
     client = await get_db()
-    chat_ids = await client[_collection_travel_planner_history].distinct(
-        "thread_id", {"user_id": user_id}
+    collection = client[_collection_travel_planner_history]
+    # 정렬은 (thread_id, user_id, timestamp) 인덱스로 처리
+    result = (
+        await collection.find(
+            {"thread_id": thread_id, "user_id": user_id},
+            {"thread_id": 1, "timestamp": 1, "display": 1},
+        )
+        .sort("timestamp", 1)
+        .to_list(length=None)
     )
-    return chat_ids
+    legacy_ids = [doc["_id"] for doc in result if "display" not in doc]
+    if legacy_ids:
+        blobs = {
+            doc["_id"]: doc
+            async for doc in collection.find(
+                {"_id": {"$in": legacy_ids}}, {"type": 1, "value": 1}
+            )
+        }
+        for doc in result:
+            doc.update(blobs.get(doc["_id"], {}))
+    return result
+
+
+async def get_thread_history(
+    user_id: str, thread_id: str, if_none_match: Optional[str] = None
+) -> Tuple[Optional[str], Optional[List[Dict[str, Any]]]]:
+    """스레드의 (ETag, 채팅 내역)을 가져옵니다.
+
+    포맷된 내역은 마지막 쓰기 시각을 version으로 history_cache에 보관하므로
+    같은 스레드를 다시 열면 인덱스 조회 한 번으로 끝납니다. if_none_match가
+    현재 ETag와 같으면 내역 대신 None을 반환합니다. 사용자의 스레드가 아니면
+    (None, [])를 반환합니다.
+    """
+    last_write = await _last_write_timestamp(user_id, thread_id)
+    if last_write is None:
+        return None, []
+    etag = history_etag(user_id, thread_id, last_write)
+    if _etag_matches(if_none_match, etag):
+        return etag, None
+    history = history_cache.get(user_id, thread_id, etag)
+    if history is None:
+        history = await _format_thread_history(user_id, thread_id)
+        history_cache.put(user_id, thread_id, etag, history)
+    return etag, history
 
 
 async def get_grouped_travel_planner_detail_history_by_chat_id(
     user_id: str, thread_id: str
 ) -> List[Dict[str, Any]]:
-    """chat_id로 그룹화된 채팅 내역을 가져옵니다."""
-    client = await get_db()
-    chat_ids = await get_thread_ids_by_user_id(user_id=user_id)
-    if thread_id not in chat_ids:
-        return []
-    chat_list = client[_collection_travel_planner_history].find(
-        {"thread_id": thread_id, "user_id": user_id}
-    )
-    result = await chat_list.to_list(length=None)
+    """chat_id로 그룹화된 채팅 내역을 시간순으로 가져옵니다."""
+    _, history = await get_thread_history(user_id, thread_id)
+    return history
+
+
+async def _format_thread_history(user_id: str, thread_id: str) -> List[Dict[str, Any]]:
+    """스레드의 쓰기 문서를 응답 형태로 포맷하고 중복 content를 제거합니다."""
+    result = await _find_thread_writes(user_id, thread_id)
     formatted_result = []
     seen_contents = set()  # 중복 제거를 위한 content 추적
 
     for item in result:
-        unpack_value = unpack_ext_type(item["value"])
-        if not unpack_value:
-            new_unpack_value = unpack_ext_type_title(item["value"])
-            if new_unpack_value:
-                unpack_value = new_unpack_value
-            else:
+        if "display" in item:
+            if not item["display"]:
                 continue
-        # <response> 태그 안의 내용만 추출
-        processed_message = unpack_value
-        content_for_dedup = None  # 중복 체크용 content
-
-        if isinstance(unpack_value, list) and len(unpack_value) > 1:
-            # unpack_value[1]이 딕셔너리이고 'content' 키가 있는 경우
-            if isinstance(unpack_value[1], dict) and "content" in unpack_value[1]:
-                original_content = unpack_value[1]["content"]
-                extracted_content = extract_response_content(original_content)
-
-                # 새로운 딕셔너리 생성 (기존 값 복사 후 content만 수정)
-                new_message_dict = unpack_value[1].copy()
-                new_message_dict["content"] = extracted_content
-                processed_message = [unpack_value[0], new_message_dict] + unpack_value[
-                    2:
-                ]
-                content_for_dedup = extracted_content
-
-        # content가 문자열인 경우 (unpack_ext_type_title의 경우)
-        if isinstance(unpack_value, str):
-            content_for_dedup = unpack_value
+            message = _display_message(item["display"])
+        else:
+            message = _legacy_message(item)
+        if not message:
+            continue
 
-        # content 중복 체크
-        if content_for_dedup and content_for_dedup in seen_contents:
-            continue  # 중복된 content는 건너뛰기
+        # 중복 체크용 content: 사용자 입력 문자열 또는 응답 content
+        content_for_dedup = message
+        if isinstance(message, list) and len(message) > 1:
+            content_for_dedup = (
+                message[1].get("content") if isinstance(message[1], dict) else None
+            )
 
-        if content_for_dedup:
+        # content 중복 체크
+        if isinstance(content_for_dedup, str) and content_for_dedup:
+            if content_for_dedup in seen_contents:
+                continue  # 중복된 content는 건너뛰기
             seen_contents.add(content_for_dedup)
 
         item = {
             "id": item["thread_id"],
             "thread_id": item["thread_id"],
-            "message": processed_message,
+            "message": message,
             "timestamp": item["timestamp"],
             "user_id": user_id,
         }
         formatted_result.append(item)
-    formatted_result.sort(key=lambda x: x["timestamp"])
     return formatted_result
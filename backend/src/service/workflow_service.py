@@ -5,7 +5,12 @@ from langchain_community.adapters.openai import convert_message_to_dict
 from langgraph.graph.state import CompiledStateGraph
 
 from ..config import TEAM_MEMBERS
-from ..graph import build_graph
+from ..graph.speculation import (
+    SPECULATIVE_PLAN_EVENT,
+    TASKS_CONFIG_KEY,
+    cancel_tasks,
+    new_task_registry,
+)
 
 # Configure logging
 logging.basicConfig(
@@ -22,49 +27,26 @@ def enable_debug_logging():
 logger = logging.getLogger(__name__)
 
 
-# Cache for coordinator messages
-coordinator_cache = []
 MAX_CACHE_SIZE = 2
 
 
-async def run_agent_workflow(
-    graph: CompiledStateGraph,
-    user_id: str,
-    thread_id: str,
-    user_input_messages: list,
-    search_before_planning: bool = False,
-):
-    """Run the agent workflow with the given user input."""
-    if not user_input_messages:
-        raise ValueError("Input could not be empty")
-
-    logger.info(f"Starting workflow with user input: {user_input_messages}")
-
-    workflow_id = str(uuid.uuid4())
+class WorkflowStreamProcessor:
+    """워크플로우 한 번의 실행 동안 LangGraph 이벤트를 SSE 이벤트로 변환합니다.
 
-    streaming_llm_agents = [*TEAM_MEMBERS, "planner", "coordinator"]
+    coordinator 버퍼와 handoff 여부를 인스턴스에 보관하므로 동시에 실행되는
+    워크플로우끼리 상태를 공유하지 않습니다.
+    """
 
-    # Reset coordinator cache at the start of each workflow
-    global coordinator_cache
-    coordinator_cache = []
-    global is_handoff_case
-    is_handoff_case = False
-    config = {
-        "configurable": {"thread_id": thread_id, "user_id": user_id},
-        "recursion_limit": 50,
-    }
+    def __init__(self, workflow_id: str, user_input_messages: list):
+        self.workflow_id = workflow_id
+        self.user_input_messages = user_input_messages
+        self.streaming_llm_agents = [*TEAM_MEMBERS, "planner", "coordinator"]
+        self.coordinator_cache = []
+        self.is_handoff_case = False
+        self.last_output = None
 
-    async for event in graph.astream_events(
-        input={
-            # Constants
-            "TEAM_MEMBERS": TEAM_MEMBERS,
-            # Runtime Variables
-            "messages": user_input_messages,
-            "search_before_planning": search_before_planning,
-        },
-        config=config,
-        version="v2",
-    ):
+    def process(self, event: dict) -> list:
+        """LangGraph 이벤트 하나를 클라이언트로 보낼 이벤트 목록으로 변환합니다."""
         kind = event.get("event")
         data = event.get("data")
         name = event.get("name")
@@ -80,21 +62,34 @@ async def run_agent_workflow(
             else str(metadata["langgraph_step"])
         )
         run_id = "" if (event.get("run_id") is None) else str(event["run_id"])
+        workflow_id = self.workflow_id
 
-        if kind == "on_chain_start" and name in streaming_llm_agents:
+        if data and "output" in data:
+            self.last_output = data["output"]
+
+        if kind == "on_chain_start" and name in self.streaming_llm_agents:
+            events = []
             if name == "planner":
-                yield {
-                    "event": "start_of_workflow",
-                    "data": {"workflow_id": workflow_id, "input": user_input_messages},
+                events.append(
+                    {
+                        "event": "start_of_workflow",
+                        "data": {
+                            "workflow_id": workflow_id,
+                            "input": self.user_input_messages,
+                        },
+                    }
+                )
+            events.append(
+                {
+                    "event": "start_of_agent",
+                    "data": {
+                        "agent_name": name,
+                        "agent_id": f"{workflow_id}_{name}_{langgraph_step}",
+                    },
                 }
-            ydata = {
-                "event": "start_of_agent",
-                "data": {
-                    "agent_name": name,
-                    "agent_id": f"{workflow_id}_{name}_{langgraph_step}",
-                },
-            }
-        elif kind == "on_chain_end" and name in streaming_llm_agents:
+            )
+            return events
+        elif kind == "on_chain_end" and name in self.streaming_llm_agents:
             ydata = {
                 "event": "end_of_agent",
                 "data": {
@@ -102,22 +97,22 @@ async def run_agent_workflow(
                     "agent_id": f"{workflow_id}_{name}_{langgraph_step}",
                 },
             }
-        elif kind == "on_chat_model_start" and node in streaming_llm_agents:
+        elif kind == "on_chat_model_start" and node in self.streaming_llm_agents:
             ydata = {
                 "event": "start_of_llm",
                 "data": {"agent_name": node},
             }
-        elif kind == "on_chat_model_end" and node in streaming_llm_agents:
+        elif kind == "on_chat_model_end" and node in self.streaming_llm_agents:
             ydata = {
                 "event": "end_of_llm",
                 "data": {"agent_name": node},
             }
-        elif kind == "on_chat_model_stream" and node in streaming_llm_agents:
+        elif kind == "on_chat_model_stream" and node in self.streaming_llm_agents:
             content = data["chunk"].content
             if content is None or content == "":
                 if not data["chunk"].additional_kwargs.get("reasoning_content"):
                     # Skip empty messages
-                    continue
+                    return []
                 ydata = {
                     "event": "message",
                     "data": {
@@ -129,43 +124,27 @@ async def run_agent_workflow(
                         },
                     },
                 }
-            else:
+            elif node == "coordinator":
                 # Check if the message is from the coordinator
-                if node == "coordinator":
-                    if len(coordinator_cache) < MAX_CACHE_SIZE:
-                        coordinator_cache.append(content)
-                        cached_content = "".join(coordinator_cache)
-                        if cached_content.startswith("handoff"):
-                            is_handoff_case = True
-                            continue
-                        if len(coordinator_cache) < MAX_CACHE_SIZE:
-                            continue
-                        # Send the cached message
-                        ydata = {
-                            "event": "message",
-                            "data": {
-                                "message_id": data["chunk"].id,
-                                "delta": {"content": cached_content},
-                            },
-                        }
-                    elif not is_handoff_case:
-                        # For other agents, send the message directly
-                        ydata = {
-                            "event": "message",
-                            "data": {
-                                "message_id": data["chunk"].id,
-                                "delta": {"content": content},
-                            },
-                        }
-                else:
-                    # For other agents, send the message directly
-                    ydata = {
-                        "event": "message",
-                        "data": {
-                            "message_id": data["chunk"].id,
-                            "delta": {"content": content},
-                        },
-                    }
+                return self._process_coordinator_chunk(data["chunk"].id, content)
+            else:
+                # For other agents, send the message directly
+                ydata = {
+                    "event": "message",
+                    "data": {
+                        "message_id": data["chunk"].id,
+                        "delta": {"content": content},
+                    },
+                }
+        elif kind == "on_custom_event" and name == SPECULATIVE_PLAN_EVENT:
+            # 미리 생성된 계획은 LLM 스트림이 없으므로 한 번에 전달
+            ydata = {
+                "event": "message",
+                "data": {
+                    "message_id": run_id,
+                    "delta": {"content": data["content"]},
+                },
+            }
         elif kind == "on_tool_start" and node in TEAM_MEMBERS:
             ydata = {
                 "event": "tool_call",
@@ -185,17 +164,101 @@ async def run_agent_workflow(
                 },
             }
         else:
-            continue
-        yield ydata
+            return []
+        return [ydata]
+
+    def _process_coordinator_chunk(self, message_id: str, content: str) -> list:
+        """handoff 여부를 판단할 수 있을 때까지 coordinator 출력을 버퍼링합니다."""
+        if len(self.coordinator_cache) < MAX_CACHE_SIZE:
+            self.coordinator_cache.append(content)
+            cached_content = "".join(self.coordinator_cache)
+            if cached_content.startswith("handoff"):
+                self.is_handoff_case = True
+                return []
+            if len(self.coordinator_cache) < MAX_CACHE_SIZE:
+                return []
+            # Send the cached message
+            return [
+                {
+                    "event": "message",
+                    "data": {
+                        "message_id": message_id,
+                        "delta": {"content": cached_content},
+                    },
+                }
+            ]
+        if self.is_handoff_case:
+            return []
+        # For other agents, send the message directly
+        return [
+            {
+                "event": "message",
+                "data": {
+                    "message_id": message_id,
+                    "delta": {"content": content},
+                },
+            }
+        ]
+
+    def finish(self) -> list:
+        """워크플로우 종료 시 보낼 이벤트 목록을 반환합니다."""
+        if not self.is_handoff_case:
+            return []
+        output = self.last_output if isinstance(self.last_output, dict) else {}
+        return [
+            {
+                "event": "end_of_workflow",
+                "data": {
+                    "workflow_id": self.workflow_id,
+                    "messages": [
+                        convert_message_to_dict(msg)
+                        for msg in output.get("messages", [])
+                    ],
+                },
+            }
+        ]
 
-    if is_handoff_case:
-        yield {
-            "event": "end_of_workflow",
-            "data": {
-                "workflow_id": workflow_id,
-                "messages": [
-                    convert_message_to_dict(msg)
-                    for msg in data["output"].get("messages", [])
-                ],
+
+async def run_agent_workflow(
+    graph: CompiledStateGraph,
+    user_id: str,
+    thread_id: str,
+    user_input_messages: list,
+    search_before_planning: bool = False,
+):
+    """Run the agent workflow with the given user input."""
+    if not user_input_messages:
+        raise ValueError("Input could not be empty")
+
+    logger.info(f"Starting workflow with user input: {user_input_messages}")
+
+    processor = WorkflowStreamProcessor(str(uuid.uuid4()), user_input_messages)
+    config = {
+        "configurable": {
+            "thread_id": thread_id,
+            "user_id": user_id,
+            TASKS_CONFIG_KEY: new_task_registry(),
+        },
+        "recursion_limit": 50,
+    }
+
+    try:
+        async for event in graph.astream_events(
+            input={
+                # Constants
+                "TEAM_MEMBERS": TEAM_MEMBERS,
+                # Runtime Variables
+                "messages": user_input_messages,
+                "search_before_planning": search_before_planning,
             },
-        }
+            config=config,
+            version="v2",
+        ):
+            for ydata in processor.process(event):
+                yield ydata
+    finally:
+        # 소비되지 않은 선행 작업(speculative planner 등) 정리
+        cancel_tasks(config)
+
+    for ydata in processor.finish():
+        yield ydata
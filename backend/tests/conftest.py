@@ -0,0 +1,52 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+# 그래프 모듈을 import할 때 LLM/검색 클라이언트가 생성되므로 더미 키를 넣어 둡니다.
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("TAVILY_API_KEY", "test")
+
+
+def _bulk_write_one_by_one(collection):
+    """mongomock의 bulk_write는 현재 pymongo의 UpdateOne을 받지 못하므로 하나씩 실행합니다."""
+
+    async def bulk_write(operations, **kwargs):
+        upserted_ids = {}
+        for index, operation in enumerate(operations):
+            result = await collection.update_one(
+                operation._filter, operation._doc, upsert=operation._upsert
+            )
+            if result.upserted_id is not None:
+                upserted_ids[index] = result.upserted_id
+        return SimpleNamespace(
+            acknowledged=True,
+            upserted_ids=upserted_ids,
+            upserted_count=len(upserted_ids),
+        )
+
+    collection.bulk_write = bulk_write
+
+
+@pytest.fixture
+def mongo_saver():
+    """mongomock 위에서 동작하는 CustomAsyncMongoDBSaver를 만드는 팩토리입니다."""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from src.db.mongodb_checkpoint import CustomAsyncMongoDBSaver
+
+    client = mongomock_motor.AsyncMongoMockClient()
+
+    def make(**kwargs) -> CustomAsyncMongoDBSaver:
+        saver = CustomAsyncMongoDBSaver(
+            client, "test_db", "checkpoints", "writes", **kwargs
+        )
+        for collection in (
+            saver.checkpoint_collection,
+            saver.writes_collection,
+            saver.summary_collection,
+        ):
+            if collection is not None:
+                _bulk_write_one_by_one(collection)
+        return saver
+
+    return make
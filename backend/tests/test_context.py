@@ -0,0 +1,46 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from src.graph.compaction import SUMMARY_MESSAGE_NAME
+from src.graph.context import build_agent_context
+
+SUMMARY = SystemMessage(content="# 이전 대화 요약", name=SUMMARY_MESSAGE_NAME)
+PLAN = AIMessage(content="부산 2박 3일 일정", name="travel_planner")
+SEARCH = AIMessage(content="부산 맛집", name="search")
+
+
+def test_follow_up_sees_the_previous_turn_result_and_summary():
+    messages = [
+        SUMMARY,
+        HumanMessage(content="부산 여행 계획 짜줘"),
+        SEARCH,
+        PLAN,
+        HumanMessage(content="그 일정 공유해줘"),
+    ]
+
+    context = build_agent_context("sharing", {"messages": messages})
+
+    assert context["messages"] == [SUMMARY, PLAN, messages[-1]]
+
+
+def test_result_of_this_turn_replaces_the_earlier_one():
+    new_plan = AIMessage(content="부산 1박 2일 일정", name="travel_planner")
+    messages = [
+        HumanMessage(content="부산 여행 계획 짜줘"),
+        PLAN,
+        HumanMessage(content="1박으로 줄이고 공유해줘"),
+        new_plan,
+    ]
+    state = {
+        "messages": messages,
+        "current_step": 1,
+        "plan_steps": [
+            {"agent_name": "travel_planner", "title": "일정", "description": "수정"},
+            {"agent_name": "sharing", "title": "공유", "description": "공유"},
+        ],
+    }
+
+    context = build_agent_context("sharing", state)["messages"]
+
+    assert context[:2] == [messages[2], new_plan]
+    assert PLAN not in context
+    assert "공유" in context[-1].content
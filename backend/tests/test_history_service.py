@@ -0,0 +1,24 @@
+from langchain_core.messages import AIMessage
+
+from src.db import get_blob_serde, message_display
+from src.service.history_service import _display_message, _legacy_message
+
+
+def test_legacy_writes_use_the_display_shape():
+    message = AIMessage(
+        content="<response>Booked</response>",
+        name="calendar",
+        tool_calls=[{"name": "create_event", "args": {"day": 1}, "id": "call"}],
+    )
+    for value in ([message], [{"role": "user", "content": "hello"}]):
+        type_, blob = get_blob_serde().dumps_typed(value)
+
+        # display가 없는 이전 문서도 새 문서와 같은 형태로 응답해야 함
+        legacy = _legacy_message({"type": type_, "value": blob})
+        assert legacy == _display_message(message_display(value))
+
+    assert _legacy_message({"type": type_, "value": blob}) == "hello"
+    assert _display_message(message_display([message])) == [
+        "AIMessage",
+        {"content": "Booked", "name": "calendar", "tool_calls": ["create_event"]},
+    ]
@@ -0,0 +1,271 @@
+import asyncio
+from typing import Annotated, TypedDict
+
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.message import REMOVE_ALL_MESSAGES, add_messages
+
+from src.db.mongodb_checkpoint import (
+    CHECKPOINT_INDEXES,
+    HISTORY_CHANNEL,
+    WRITES_INDEXES,
+    _index_keys,
+    drop_superseded_indexes,
+    provision_indexes,
+)
+
+
+def _key_patterns(info: dict) -> set:
+    return {_index_keys(index["key"]) for index in info.values()}
+
+
+def test_drop_superseded_indexes_keeps_the_current_ones(mongo_saver):
+    async def main():
+        saver = mongo_saver()
+        # langgraph-checkpoint-mongodb가 만들던 기존 인덱스
+        await saver.checkpoint_collection.create_index(
+            [("thread_id", 1), ("checkpoint_ns", 1), ("checkpoint_id", -1)],
+            unique=True,
+        )
+        await saver.writes_collection.create_index(
+            [
+                ("thread_id", 1),
+                ("checkpoint_ns", 1),
+                ("checkpoint_id", -1),
+                ("task_id", 1),
+                ("user_id", 1),
+                ("idx", 1),
+            ],
+            unique=True,
+        )
+        await provision_indexes(saver.db, "checkpoints", "writes")
+
+        dropped = await drop_superseded_indexes(saver.db, "checkpoints", "writes")
+
+        assert len(dropped) == 2
+        checkpoint_keys = _key_patterns(
+            await saver.checkpoint_collection.index_information()
+        )
+        writes_keys = _key_patterns(await saver.writes_collection.index_information())
+        assert checkpoint_keys >= {
+            _index_keys(index.document["key"].items()) for index in CHECKPOINT_INDEXES
+        }
+        assert writes_keys >= {
+            _index_keys(index.document["key"].items()) for index in WRITES_INDEXES
+        }
+        legacy = (("thread_id", 1), ("checkpoint_ns", 1), ("checkpoint_id", -1))
+        assert legacy not in checkpoint_keys
+        assert await drop_superseded_indexes(saver.db, "checkpoints", "writes") == []
+
+    asyncio.run(main())
+
+
+class _MessagesState(TypedDict):
+    messages: Annotated[list, add_messages]
+
+
+def _nested_graph(checkpointer):
+    """하위 에이전트처럼 실행마다 새 네임스페이스에 체크포인트를 남기는 그래프."""
+
+    def step(state: _MessagesState) -> dict:
+        return {"messages": [AIMessage(content=f"step {len(state['messages'])}")]}
+
+    agent = StateGraph(_MessagesState)
+    agent.add_node("think", step)
+    agent.add_node("answer", step)
+    agent.add_edge(START, "think")
+    agent.add_edge("think", "answer")
+    agent.add_edge("answer", END)
+
+    graph = StateGraph(_MessagesState)
+    graph.add_node("agent", agent.compile())
+    graph.add_edge(START, "agent")
+    graph.add_edge("agent", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+def test_prune_bounds_subgraph_checkpoints_across_turns(mongo_saver):
+    async def main():
+        saver = mongo_saver()
+        graph = _nested_graph(saver)
+        config = {"configurable": {"thread_id": "thread", "user_id": "user"}}
+        pruned_writes = {"channel": {"$ne": HISTORY_CHANNEL}}
+        sizes = []
+        for turn in range(8):
+            await graph.ainvoke({"messages": [HumanMessage(f"turn {turn}")]}, config)
+            await saver.aprune_checkpoints(keep_last=4)
+            sizes.append(
+                (
+                    await saver.checkpoint_collection.count_documents({}),
+                    await saver.writes_collection.count_documents(pruned_writes),
+                    await saver.checkpoint_collection.count_documents(
+                        {"checkpoint_ns": {"$ne": ""}}
+                    ),
+                )
+            )
+
+        # 몇 턴 뒤부터는 턴이 늘어도 문서 수가 더 늘지 않아야 함
+        assert sizes[3:] == [sizes[3]] * 5
+        assert sizes[-1][2] > 0
+        # 루트 대화 기록은 정리되지 않음
+        state = await graph.aget_state(config)
+        assert len(state.values["messages"]) == 8 * 3
+
+    asyncio.run(main())
+
+
+def _chat_graph(checkpointer):
+    """입력 메시지마다 결정적인 id의 답변을 하나씩 붙이는 그래프."""
+
+    def reply(state: _MessagesState) -> dict:
+        count = len(state["messages"])
+        return {"messages": [AIMessage(content=f"reply {count}", id=f"ai{count}")]}
+
+    graph = StateGraph(_MessagesState)
+    graph.add_node("reply", reply)
+    graph.add_edge(START, "reply")
+    graph.add_edge("reply", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+async def _chat(saver, thread_id: str, turns: int) -> dict:
+    """여러 턴을 실행하고 과거 체크포인트에서 update_state로 분기합니다."""
+    graph = _chat_graph(saver)
+    config = {"configurable": {"thread_id": thread_id, "user_id": "user"}}
+    for turn in range(turns):
+        await graph.ainvoke(
+            {"messages": [HumanMessage(content=f"turn {turn}", id=f"h{turn}")]}, config
+        )
+    history = [state async for state in graph.aget_state_history(config)]
+    fork = history[len(history) // 2].config
+    # 메시지 추가, 기존 메시지 수정, 메시지 삭제로 각각 분기
+    for name, update in (
+        ("append", HumanMessage(content="forked", id="fork")),
+        ("edit", AIMessage(content="edited", id="ai1")),
+        ("remove", RemoveMessage(id="h0")),
+    ):
+        forked = await graph.aupdate_state(
+            fork, {"messages": [update]}, as_node="reply"
+        )
+        await graph.ainvoke(
+            {"messages": [HumanMessage(content=f"after {name}", id=name)]}, forked
+        )
+    return config
+
+
+async def _history(saver, config: dict) -> list:
+    graph = _chat_graph(saver)
+    return [
+        (state.values, state.next, state.metadata["step"])
+        async for state in graph.aget_state_history(config)
+    ]
+
+
+def test_delta_chain_rebuilds_the_same_states_as_full_storage(mongo_saver):
+    async def main():
+        full_config = await _chat(mongo_saver(), "full", turns=6)
+        delta = mongo_saver(storage_mode="delta", snapshot_interval=4)
+        delta_config = await _chat(delta, "delta", turns=6)
+
+        # 새 저장소는 delta head 캐시가 비어 있으므로 저장된 문서만으로 복원
+        reader = mongo_saver(storage_mode="delta", snapshot_interval=4)
+        expected = await _history(mongo_saver(), full_config)
+        assert await _history(reader, delta_config) == expected
+
+        docs = await delta.checkpoint_collection.find(
+            {"thread_id": "delta", "patched_channels": HISTORY_CHANNEL}
+        ).to_list(length=None)
+        assert docs
+
+    asyncio.run(main())
+
+
+def test_delta_messages_store_only_the_new_messages(mongo_saver):
+    async def main():
+        saver = mongo_saver(storage_mode="delta", snapshot_interval=1000)
+        graph = _chat_graph(saver)
+        config = {"configurable": {"thread_id": "thread", "user_id": "user"}}
+        for turn in range(30):
+            await graph.ainvoke(
+                {"messages": [HumanMessage(content="hello", id=f"h{turn}")]}, config
+            )
+        docs = await saver.checkpoint_collection.find(
+            {"thread_id": "thread", "checkpoint_ns": "", "delta_depth": {"$gt": 0}}
+        ).to_list(length=None)
+        sizes = [len(doc["checkpoint"]) for doc in docs]
+        # 대화가 60개 메시지로 길어져도 델타 문서 크기는 늘지 않아야 함
+        assert max(sizes[-10:]) <= 1.2 * max(sizes[:10])
+
+    asyncio.run(main())
+
+
+def test_delta_chain_loads_after_prune(mongo_saver):
+    async def main():
+        saver = mongo_saver(storage_mode="delta", snapshot_interval=4)
+        config = await _chat(saver, "thread", turns=6)
+        graph = _chat_graph(saver)
+        before = (await graph.aget_state(config)).values
+
+        assert await saver.aprune_checkpoints(keep_last=3) > 0
+        reader = mongo_saver(storage_mode="delta", snapshot_interval=4)
+        history = await _history(reader, config)
+        assert history[0][0] == before
+        assert len(history) >= 3
+
+    asyncio.run(main())
+
+
+async def _write_history(saver, checkpoint_id: str, task_id: str, value: list):
+    config = {
+        "configurable": {
+            "thread_id": "thread",
+            "user_id": "user",
+            "checkpoint_ns": "",
+            "checkpoint_id": checkpoint_id,
+        }
+    }
+    await saver.aput_writes(config, [(HISTORY_CHANNEL, value)], task_id)
+
+
+async def _message_count(saver) -> int:
+    summary = await saver.summary_collection.find_one({"thread_id": "thread"})
+    return summary["message_count"]
+
+
+def test_summary_counts_each_history_write_once(mongo_saver):
+    async def main():
+        for write_behind_interval in (None, 60):
+            saver = mongo_saver(
+                summary_collection_name=f"summaries_{write_behind_interval}",
+                write_behind_interval=write_behind_interval,
+            )
+            await saver.writes_collection.delete_many({})
+            messages = [HumanMessage("hi", id="h0"), AIMessage("hello", id="ai1")]
+            await _write_history(saver, "1", "task", messages)
+            # 같은 (task_id, idx) 쓰기의 재시도는 새 메시지가 아님
+            await _write_history(saver, "1", "task", messages)
+            # compaction은 기존 메시지를 지우고 다시 넣음
+            await _write_history(
+                saver,
+                "2",
+                "compactor",
+                [RemoveMessage(id=REMOVE_ALL_MESSAGES), *messages],
+            )
+            await saver.aflush()
+            assert await _message_count(saver) == 2
+
+    asyncio.run(main())
+
+
+def test_backfill_summaries_only_runs_on_an_empty_collection(mongo_saver):
+    async def main():
+        writer = mongo_saver()
+        await _write_history(writer, "1", "task", [{"role": "user", "content": "hi"}])
+
+        saver = mongo_saver(summary_collection_name="summaries")
+        assert await saver.abackfill_summaries() == 1
+        summary = await saver.summary_collection.find_one({"thread_id": "thread"})
+        assert (summary["title"], summary["message_count"]) == ("hi", 1)
+        assert await saver.abackfill_summaries() == 0
+
+    asyncio.run(main())
@@ -0,0 +1,47 @@
+import asyncio
+
+from src.graph.speculation import (
+    TASKS_CONFIG_KEY,
+    cancel_tasks,
+    new_task_registry,
+    pop_task,
+    start_task,
+)
+
+
+def _config(thread_id: str = "thread") -> dict:
+    return {
+        "configurable": {
+            "thread_id": thread_id,
+            "user_id": "user",
+            TASKS_CONFIG_KEY: new_task_registry(),
+        }
+    }
+
+
+async def _plan(text: str) -> str:
+    await asyncio.sleep(0.01)
+    return text
+
+
+def test_runs_on_the_same_thread_keep_their_own_tasks():
+    async def main():
+        first, second = _config(), _config()
+        start_task(first, "planner", _plan("first"))
+        start_task(second, "planner", _plan("second"))
+
+        # 한 실행의 종료가 같은 스레드의 다른 실행 작업을 취소하면 안 됨
+        cancel_tasks(first)
+        assert pop_task(first, "planner") is None
+        assert await pop_task(second, "planner") == "second"
+
+    asyncio.run(main())
+
+
+def test_start_task_without_registry_does_not_start():
+    async def main():
+        config = {"configurable": {"thread_id": "thread", "user_id": "user"}}
+        assert start_task(config, "planner", _plan("plan")) is None
+        assert pop_task(config, "planner") is None
+
+    asyncio.run(main())
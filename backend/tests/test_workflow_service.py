@@ -0,0 +1,111 @@
+import asyncio
+from types import SimpleNamespace
+
+from langchain_core.messages import AIMessage
+
+from src.service.workflow_service import WorkflowStreamProcessor, run_agent_workflow
+
+
+def _chunk(content: str, message_id: str) -> dict:
+    return {
+        "event": "on_chat_model_stream",
+        "name": "ChatOpenAI",
+        "metadata": {"checkpoint_ns": "coordinator:1", "langgraph_step": 1},
+        "data": {
+            "chunk": SimpleNamespace(
+                content=content, id=message_id, additional_kwargs={}
+            )
+        },
+    }
+
+
+def _end(content: str) -> dict:
+    return {
+        "event": "on_chain_end",
+        "name": "LangGraph",
+        "metadata": {},
+        "data": {"output": {"messages": [AIMessage(content=content)]}},
+    }
+
+
+class FakeGraph:
+    """coordinator 스트림만 흉내 내는 그래프. 청크마다 이벤트 루프에 양보합니다."""
+
+    def __init__(self, chunks: dict[str, list[str]]) -> None:
+        self.chunks = chunks
+        self.emitted = []
+
+    async def astream_events(self, input, config, version):
+        thread_id = config["configurable"]["thread_id"]
+        for content in self.chunks[thread_id]:
+            await asyncio.sleep(0)
+            self.emitted.append(thread_id)
+            yield _chunk(content, f"{thread_id}-msg")
+        await asyncio.sleep(0)
+        yield _end(f"{thread_id} done")
+
+
+async def _collect(graph: FakeGraph, thread_id: str) -> list:
+    return [
+        event
+        async for event in run_agent_workflow(
+            graph, "user", thread_id, [{"role": "user", "content": thread_id}]
+        )
+    ]
+
+
+def test_interleaved_runs_keep_their_own_stream_state():
+    graph = FakeGraph(
+        {
+            "handoff": ["hand", "off", "_to", "_planner()"],
+            "direct": ["Hel", "lo", " the", "re"],
+        }
+    )
+
+    async def main():
+        return await asyncio.gather(
+            _collect(graph, "handoff"), _collect(graph, "direct")
+        )
+
+    handoff_events, direct_events = asyncio.run(main())
+
+    # 두 실행이 같은 루프에서 번갈아 진행되었는지 확인
+    assert graph.emitted[:4] == ["handoff", "direct", "handoff", "direct"]
+
+    # handoff 실행은 coordinator 출력을 내보내지 않고 end_of_workflow만 보냅니다.
+    assert [event["event"] for event in handoff_events] == ["end_of_workflow"]
+    assert handoff_events[0]["data"]["messages"][0]["content"] == "handoff done"
+
+    # 직접 응답 실행은 자기 coordinator 출력만 받고 end_of_workflow는 받지 않습니다.
+    assert [event["event"] for event in direct_events] == ["message"] * 3
+    assert (
+        "".join(event["data"]["delta"]["content"] for event in direct_events)
+        == "Hello there"
+    )
+    assert all(event["data"]["message_id"] == "direct-msg" for event in direct_events)
+
+
+def test_processors_do_not_share_coordinator_buffers():
+    handoff = WorkflowStreamProcessor("handoff", [])
+    direct = WorkflowStreamProcessor("direct", [])
+
+    outputs = {"handoff": [], "direct": []}
+    for handoff_content, direct_content in zip(
+        ["hand", "off", "_to", "_planner()"], ["Hel", "lo", " the", "re"]
+    ):
+        outputs["handoff"] += handoff.process(_chunk(handoff_content, "h"))
+        outputs["direct"] += direct.process(_chunk(direct_content, "d"))
+    handoff.process(_end("handoff done"))
+    direct.process(_end("direct done"))
+
+    assert handoff.coordinator_cache == ["hand", "off"]
+    assert direct.coordinator_cache == ["Hel", "lo"]
+    assert handoff.is_handoff_case and not direct.is_handoff_case
+    assert outputs["handoff"] == []
+    assert [event["data"]["delta"]["content"] for event in outputs["direct"]] == [
+        "Hello",
+        " the",
+        "re",
+    ]
+    assert [event["event"] for event in handoff.finish()] == ["end_of_workflow"]
+    assert direct.finish() == []
@@ -132,8 +132,10 @@ if "step_placeholders" not in st.session_state:
 # 대화 기록 상태
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
-if "current_page" not in st.session_state:
-    st.session_state.current_page = 1
+if "next_history_cursor" not in st.session_state:
+    st.session_state.next_history_cursor = None
+if "conversation_cache" not in st.session_state:
+    st.session_state.conversation_cache = {}
 if "total_history_count" not in st.session_state:
     st.session_state.total_history_count = 0
 if "selected_thread_id" not in st.session_state:
@@ -203,16 +205,19 @@ if user_id:
     st.sidebar.success(f"사용자 ID: {user_id}")
 
     # 대화 기록 로드 함수
-    def load_chat_history(page=1, reset=False):
+    def load_chat_history(cursor=None, reset=False):
         if reset:
             st.session_state.chat_history = []
-            st.session_state.current_page = 1
-            page = 1
+            st.session_state.next_history_cursor = None
+            cursor = None
 
+        params = {"user_id": user_id, "page_size": 10}
+        if cursor:
+            params["cursor"] = cursor
         try:
             response = requests.get(
                 f"{backend_url}/api/chat/history/all",
-                params={"user_id": user_id, "page": page, "page_size": 10},
+                params=params,
             )
             if response.status_code == 200:
                 data = response.json()
@@ -221,7 +226,7 @@ if user_id:
                 else:
                     st.session_state.chat_history.extend(data["history"])
                 st.session_state.total_history_count = data["total_cnt"]
-                st.session_state.current_page = page
+                st.session_state.next_history_cursor = data.get("next_cursor")
                 return True
         except Exception as e:
             st.sidebar.error(f"대화 기록을 불러오는데 실패했습니다: {e}")
@@ -230,12 +235,25 @@ if user_id:
     # 특정 대화 내용 로드 함수
     def load_conversation(thread_id):
         try:
+            # 이전에 받은 대화는 ETag로 변경 여부만 확인 (변경이 없으면 304)
+            cached = st.session_state.conversation_cache.get(thread_id)
             response = requests.get(
                 f"{backend_url}/api/chat/history",
                 params={"user_id": user_id, "thread_id": thread_id},
+                headers={"If-None-Match": cached[0]} if cached else {},
             )
-            if response.status_code == 200:
+            if response.status_code == 304 and cached:
+                conversation_data = list(cached[1])
+            elif response.status_code == 200:
                 conversation_data = response.json()
+                if response.headers.get("ETag"):
+                    st.session_state.conversation_cache[thread_id] = (
+                        response.headers["ETag"],
+                        conversation_data,
+                    )
+            else:
+                conversation_data = None
+            if conversation_data is not None:
                 # 메시지를 시간순으로 정렬
                 conversation_data.sort(key=lambda x: x["timestamp"])
 
@@ -435,9 +453,9 @@ if user_id:
                 load_conversation(thread_id)
 
         # 더 보기 버튼
-        if len(st.session_state.chat_history) < st.session_state.total_history_count:
+        if st.session_state.next_history_cursor:
             if st.sidebar.button("📋 더 보기", use_container_width=True):
-                load_chat_history(st.session_state.current_page + 1)
+                load_chat_history(st.session_state.next_history_cursor)
                 st.rerun()
 
     else: